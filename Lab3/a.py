@@ -1,7 +1,31 @@
 '''Lab 3 Task 1
 Descriprions of the functions:
-
+    shingles - list of k-shingles of a string
+    read_chunks - reads a text stream in fixed size chunks
+    iter_token_lists - lazily splits text chunks into lists of tokens
+    iter_tokens - lazily splits text chunks into tokens
+    iter_shingles - lazily generates k-shingles from text chunks
+    hashed_shingles - sorted array of unique 64-bit k-shingle hashes from text chunks
+    multi_k_shingles - shingle sets for several k from one pass over text chunks
+    iter_hashed_shingle_blocks - lazily generates blocks of 64-bit k-shingle hashes from text chunks
+    multi_k_hashed_shingles - hashed shingles for several k from one pass over text chunks
+    Vocabulary - interns tokens as integer ids
+    encoded_shingles - k-shingles of token ids packed into integers
 '''
+import hashlib
+from collections import deque
+from functools import partial
+
+import numpy as np
+
+# Default number of characters read at once by read_chunks
+CHUNK_SIZE = 1 << 16
+# Base of the polynomial rolling hash of k-grams, arithmetic wraps modulo 2**64
+HASH_BASE = np.uint64(0x100000001B3)
+# Number of tokens hashed at once by hashed_shingles
+HASH_BLOCK_SIZE = 1 << 16
+# Maximal number of token hashes remembered by hashed_shingles
+TOKEN_CACHE_SIZE = 1 << 20
 
 def shingles(t:str, k:int ) -> list:
     """
@@ -31,6 +55,347 @@ def shingles(t:str, k:int ) -> list:
     return result
 
 
+def read_chunks(stream, chunk_size: int = CHUNK_SIZE):
+    """
+    Reads a text stream in chunks of at most `chunk_size` characters.
+    Args:
+        stream: file-like object opened in text mode
+        chunk_size: integer, number of characters per chunk
+
+    Returns:
+        iterator over the chunks
+    Rises:
+        ValueError: if chunk_size is not positive
+    """
+    if not isinstance(chunk_size, int) or chunk_size <= 0:
+        raise ValueError("chunk_size must be a positive integer")
+    return iter(partial(stream.read, chunk_size), '')
+
+
+def iter_token_lists(chunks):
+    """
+    Same as iter_tokens, but yields the tokens of every chunk together as one list.
+    Args:
+        chunks: iterable of strings, or of bytes (then the tokens are bytes too)
+
+    Returns:
+        generator of non-empty lists of tokens
+    """
+    tail = None
+    for chunk in chunks:
+        if not chunk:
+            continue
+        parts = chunk.split(b' ' if isinstance(chunk, bytes) else ' ')
+        if tail is not None:
+            parts[0] = tail + parts[0]
+        tail = parts.pop()
+        if parts:
+            yield parts
+    if tail is not None:
+        yield [tail]
+
+
+def iter_tokens(chunks):
+    """
+    Splits text given in chunks into tokens in the same way as shingles does (on single spaces).
+    A token cut by a chunk boundary is carried over to the next chunk.
+    Args:
+        chunks: iterable of strings, or of bytes (then the tokens are bytes too)
+
+    Returns:
+        generator of tokens, nothing for an empty input
+    """
+    for tokens in iter_token_lists(chunks):
+        yield from tokens
+
+
+def iter_shingles(chunks, k: int):
+    """
+    Lazily generates k-shingles from text given in chunks, only the last k tokens are kept in memory.
+    For a single chunk the result is the same as shingles(chunk, k).
+    Args:
+        chunks: iterable of strings, or of bytes (then the shingles are bytes too)
+        k: integer, size of the shingles
+
+    Returns:
+        generator of shingles
+    Rises:
+        TypeError: if k is not an integer
+        ValueError: if k is greater than the number of words in the text or is not positive
+    """
+    if not isinstance(k, int):
+        raise TypeError("k must be an integer")
+    if k <= 0:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    window = deque(maxlen=k)
+    separator = None
+    for token in iter_tokens(chunks):
+        if separator is None:
+            separator = b' ' if isinstance(token, bytes) else ' '
+        window.append(token)
+        if len(window) == k:
+            yield separator.join(window)
+    if len(window) < k:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+
+
+def _hash_token(token) -> int:
+    """Stable 64-bit hash of a token, a str token has the hash of its UTF-8 bytes."""
+    if isinstance(token, str):
+        token = token.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(token, digest_size=8).digest(), 'little')
+
+
+def _sorted_unique(hashes: np.ndarray) -> np.ndarray:
+    """Sorted unique values of an array, by sorting (faster than np.unique for large uint64 arrays)."""
+    hashes = np.sort(hashes)
+    if len(hashes) == 0:
+        return hashes
+    keep = np.empty(len(hashes), dtype=bool)
+    keep[0] = True
+    np.not_equal(hashes[1:], hashes[:-1], out=keep[1:])
+    return hashes[keep]
+
+
+def _rolling_hashes(token_hashes: np.ndarray, ks: list) -> dict:
+    """Polynomial hash of every k-gram of token_hashes for each k in ks.
+
+    Horner's rule extends the (j)-gram hashes to (j+1)-gram hashes, so all sizes up to max(ks)
+    cost max(ks) vector operations together.
+    """
+    result = {}
+    hashes = np.zeros(len(token_hashes), dtype=np.uint64)
+    for j in range(max(ks)):
+        # a block shorter than j+1 tokens gets an empty array, every k is in the result
+        n = max(len(token_hashes) - j, 0)
+        hashes = hashes[:n] * HASH_BASE + token_hashes[j:j + n]
+        if j + 1 in ks:
+            result[j + 1] = hashes
+    return result
+
+
+def _check_ks(ks) -> list:
+    """Validates a collection of shingle sizes and returns them sorted without duplicates."""
+    ks = sorted(set(ks))
+    if len(ks) == 0:
+        raise ValueError("At least one k must be given")
+    if not all(isinstance(k, int) for k in ks):
+        raise TypeError("k must be an integer")
+    if ks[0] <= 0:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    return ks
+
+
+def _add_block_shingles(result: dict, tokens: list, separator):
+    """Adds the k-grams of a block of tokens to result[k] for every k of result."""
+    for k, shingle_set in result.items():
+        shingle_set.update(map(separator.join, zip(*(tokens[j:] for j in range(k)))))
+
+
+def multi_k_shingles(chunks, ks) -> dict:
+    """
+    Generates the sets of k-shingles for several k in a single pass over the tokens.
+    Every set is the same as set(iter_shingles(chunks, k)).
+    Args:
+        chunks: iterable of strings (or bytes)
+        ks: iterable of integers, sizes of the shingles
+
+    Returns:
+        dictionary mapping every k to its set of shingles
+    Rises:
+        TypeError: if a k is not an integer
+        ValueError: if no k is given, or a k is greater than the number of words in the text or is not positive
+    """
+    ks = _check_ks(ks)
+    max_k = ks[-1]
+    result = {k: set() for k in ks}
+    buffer = []
+    n_tokens = 0
+    separator = None
+    for tokens in iter_token_lists(chunks):
+        buffer.extend(tokens)
+        n_tokens += len(tokens)
+        if len(buffer) >= HASH_BLOCK_SIZE + max_k - 1:
+            separator = b' ' if isinstance(tokens[0], bytes) else ' '
+            _add_block_shingles(result, buffer, separator)
+            # the last max_k-1 tokens start the k-grams of the next block,
+            # the shorter k-grams among them are added to the sets a second time
+            buffer = buffer[len(buffer) - max_k + 1:]
+    if n_tokens < max_k:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    if separator is None:
+        separator = b' ' if isinstance(buffer[0], bytes) else ' '
+    _add_block_shingles(result, buffer, separator)
+    return result
+
+
+def iter_hashed_shingle_blocks(chunks, ks):
+    """
+    Generates the hashed k-shingles (see hashed_shingles) block by block, without keeping the whole text.
+    A shingle can appear in several blocks and several times in a block.
+    Args:
+        chunks: iterable of strings, or of UTF-8 bytes (giving the same hashes)
+        ks: iterable of integers, sizes of the shingles
+
+    Returns:
+        generator of dictionaries mapping every k to an np.ndarray of uint64 shingle hashes (empty when the
+        block is too short for a k-shingle)
+    Rises:
+        TypeError: if a k is not an integer
+        ValueError: if no k is given, or a k is greater than the number of words in the text or is not positive
+    """
+    ks = _check_ks(ks)
+    max_k = ks[-1]
+    buffer = []
+    n_tokens = 0
+    # hashes of recently seen tokens, most of the tokens of a text repeat
+    known = {}
+    for tokens in iter_token_lists(chunks):
+        for token in tokens:
+            token_hash = known.get(token)
+            if token_hash is None:
+                if len(known) >= TOKEN_CACHE_SIZE:
+                    known.clear()
+                token_hash = known[token] = _hash_token(token)
+            buffer.append(token_hash)
+        n_tokens += len(tokens)
+        if len(buffer) >= HASH_BLOCK_SIZE + max_k - 1:
+            yield _rolling_hashes(np.array(buffer, dtype=np.uint64), ks)
+            # the last max_k-1 tokens start the k-grams of the next block,
+            # the shorter k-grams among them are generated a second time
+            buffer = buffer[len(buffer) - max_k + 1:]
+    if n_tokens < max_k:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    yield _rolling_hashes(np.array(buffer, dtype=np.uint64), ks)
+
+
+def multi_k_hashed_shingles(chunks, ks) -> dict:
+    """
+    Generates the hashed k-shingles (see hashed_shingles) for several k in a single pass over the tokens.
+    Args:
+        chunks: iterable of strings, or of UTF-8 bytes (giving the same hashes)
+        ks: iterable of integers, sizes of the shingles
+
+    Returns:
+        dictionary mapping every k to its sorted np.ndarray of unique uint64 shingle hashes
+    Rises:
+        TypeError: if a k is not an integer
+        ValueError: if no k is given, or a k is greater than the number of words in the text or is not positive
+    """
+    ks = _check_ks(ks)
+    blocks = {k: [] for k in ks}
+    for block in iter_hashed_shingle_blocks(chunks, ks):
+        for k, hashes in block.items():
+            # duplicates are removed per block to keep the concatenated blocks small
+            blocks[k].append(_sorted_unique(hashes))
+    return {k: _sorted_unique(np.concatenate(blocks[k])) for k in ks}
+
+
+def hashed_shingles(chunks, k: int) -> np.ndarray:
+    """
+    Generates k-shingles from text given in chunks as 64-bit hashes instead of joined strings.
+    Two different shingles have the same hash only by (unlikely) collision.
+    Args:
+        chunks: iterable of strings, or of UTF-8 bytes (giving the same hashes)
+        k: integer, size of the shingles
+
+    Returns:
+        sorted np.ndarray of unique uint64 shingle hashes
+    Rises:
+        TypeError: if k is not an integer
+        ValueError: if k is greater than the number of words in the text or is not positive
+    """
+    if not isinstance(k, int):
+        raise TypeError("k must be an integer")
+    return multi_k_hashed_shingles(chunks, [k])[k]
+
+
+class Vocabulary:
+    """Interns tokens as consecutive integer ids, so every distinct token text is stored once.
+
+    Attributes:
+        tokens (list): Token of every id.
+    """
+
+    def __init__(self):
+        self.tokens = []
+        self._ids = {}
+
+    def __len__(self) -> int:
+        return len(self.tokens)
+
+    @property
+    def bits(self) -> int:
+        """Number of bits needed for any id of the vocabulary."""
+        return max(1, (len(self.tokens) - 1).bit_length())
+
+    def encode(self, token: str) -> int:
+        """Returns the id of a token, adding it to the vocabulary if it is new."""
+        token_id = self._ids.get(token)
+        if token_id is None:
+            token_id = self._ids[token] = len(self.tokens)
+            self.tokens.append(token)
+        return token_id
+
+    def encode_tokens(self, chunks) -> np.ndarray:
+        """
+        Splits text given in chunks into tokens (see iter_tokens) and encodes them.
+        Args:
+            chunks: iterable of strings
+
+        Returns:
+            np.ndarray of uint32 token ids
+        """
+        blocks = [np.fromiter(map(self.encode, tokens), dtype=np.uint32, count=len(tokens))
+                  for tokens in iter_token_lists(chunks)]
+        return np.concatenate(blocks) if blocks else np.zeros(0, dtype=np.uint32)
+
+    def decode(self, shingle: int, k: int, bits: int) -> str:
+        """
+        Decodes a shingle packed by encoded_shingles back to text.
+        Args:
+            shingle: integer, packed shingle
+            k: integer, size of the shingle
+            bits: integer, bits per token id used for packing
+
+        Returns:
+            shingle text
+        """
+        shingle = int(shingle)
+        mask = (1 << bits) - 1
+        ids = [(shingle >> (bits * (k - 1 - j))) & mask for j in range(k)]
+        return " ".join(self.tokens[token_id] for token_id in ids)
+
+
+def encoded_shingles(token_ids: np.ndarray, k: int, bits: int) -> np.ndarray:
+    """
+    Packs every k consecutive token ids into one integer, bits bits per id, without any collision.
+    The result is a uint64 array when k * bits <= 64, otherwise an object array of Python integers.
+    Args:
+        token_ids: np.ndarray of token ids (see Vocabulary.encode_tokens)
+        k: integer, size of the shingles
+        bits: integer, bits per id, at least Vocabulary.bits of the vocabulary used
+
+    Returns:
+        np.ndarray of packed shingles in text order
+    Rises:
+        TypeError: if k is not an integer
+        ValueError: if k is greater than the number of tokens or is not positive
+    """
+    if not isinstance(k, int):
+        raise TypeError("k must be an integer")
+    if k > len(token_ids) or k <= 0:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    n = len(token_ids) - k + 1
+    if k * bits <= 64:
+        ids, shift, result = token_ids.astype(np.uint64), np.uint64(bits), np.zeros(n, dtype=np.uint64)
+    else:
+        ids, shift, result = token_ids.astype(object), bits, np.zeros(n, dtype=object)
+    for j in range(k):
+        result = (result << shift) | ids[j:j + n]
+    return result
+
+
 def main ():
     print(shingles("one two three four five", 3))
     print(shingles("Hello world", 2))
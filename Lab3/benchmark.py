@@ -0,0 +1,217 @@
+'''Lab 3 benchmarks of the shingling and similarity pipeline
+Descriptions of the functions:
+    generate_corpus - synthetic documents with a configurable vocabulary and duplication rate
+    run_benchmark - times every stage and measures its peak memory
+    compare_results - finds the stages which got slower between two runs
+    run_parallel_benchmark - times the serial shingle count against count_shingles_parallel
+'''
+import argparse
+import io
+import json
+import platform
+import random
+import sys
+import time
+import tracemalloc
+
+from collections import Counter
+
+from a import shingles, hashed_shingles, iter_shingles, read_chunks
+from compare import preprocess_text, jaccard_similarity, jaccard_similarity_hashed
+from shingle import counter_shingles, count_shingles_parallel
+
+
+def generate_corpus(n_docs: int = 2, doc_length: int = 100000, vocab_size: int = 5000,
+                    duplication_rate: float = 0.5, seed: int = 0) -> list:
+    """
+    Generates synthetic documents of random words with some punctuation.
+
+    Every document after the first copies each of its tokens from the first document with
+    probability `duplication_rate`, so the documents are near-duplicates of each other.
+
+    Args:
+        n_docs (int): Number of documents.
+        doc_length (int): Number of tokens per document.
+        vocab_size (int): Number of distinct words.
+        duplication_rate (float): Fraction of tokens copied from the first document.
+        seed (int): Seed of the random generator.
+
+    Returns:
+        list: Documents as strings.
+    Raises:
+        ValueError: If a size is not positive or duplication_rate is not in [0, 1].
+    """
+    if min(n_docs, doc_length, vocab_size) <= 0:
+        raise ValueError("Sizes must be positive.")
+    if not 0.0 <= duplication_rate <= 1.0:
+        raise ValueError("Duplication rate must be between 0 and 1.")
+    rng = random.Random(seed)
+    vocabulary = [f"word{i}" + rng.choice(["", "", "", ",", "."]) for i in range(vocab_size)]
+    base = [rng.choice(vocabulary) for _ in range(doc_length)]
+    documents = [" ".join(base)]
+    for _ in range(n_docs - 1):
+        tokens = [token if rng.random() < duplication_rate else rng.choice(vocabulary) for token in base]
+        documents.append(" ".join(tokens))
+    return documents
+
+
+def _measure(func, args: tuple, repeat: int) -> tuple:
+    """Best wall time of `repeat` calls, and the peak traced memory of one more call."""
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(*args)
+        best = min(best, time.perf_counter() - start)
+    # tracemalloc slows the code down, so the memory is measured in a separate call
+    tracemalloc.start()
+    try:
+        func(*args)
+        _, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return best, peak
+
+
+def run_benchmark(documents: list, k: int = 3, repeat: int = 3) -> dict:
+    """
+    Times every stage of the pipeline on the first two documents.
+
+    Args:
+        documents (list): At least two documents, see generate_corpus.
+        k (int): Size of the shingles.
+        repeat (int): Number of timed calls per stage, the best one is reported.
+
+    Returns:
+        dict: For every stage, "seconds", "tokens_per_s" and "peak_bytes".
+    Raises:
+        ValueError: If fewer than two documents are given.
+    """
+    if len(documents) < 2:
+        raise ValueError("At least two documents are needed.")
+    text1, text2 = documents[0], documents[1]
+    n_tokens = len(text1.split(' ')) + len(text2.split(' '))
+    clean1, clean2 = preprocess_text(text1, True), preprocess_text(text2, True)
+    shingles1, shingles2 = shingles(clean1, k), shingles(clean2, k)
+    set1, set2 = set(shingles1), set(shingles2)
+    hashes1, hashes2 = hashed_shingles([clean1], k), hashed_shingles([clean2], k)
+
+    stages = {
+        "preprocess_text": (lambda: (preprocess_text(text1, True), preprocess_text(text2, True)), ()),
+        "shingles": (lambda: (shingles(clean1, k), shingles(clean2, k)), ()),
+        "hashed_shingles": (lambda: (hashed_shingles([clean1], k), hashed_shingles([clean2], k)), ()),
+        "counter_shingles": (lambda: (counter_shingles(shingles1), counter_shingles(shingles2)), ()),
+        "jaccard_similarity": (jaccard_similarity, (set1, set2)),
+        "jaccard_similarity_hashed": (jaccard_similarity_hashed, (hashes1, hashes2)),
+    }
+    results = {}
+    for name, (func, args) in stages.items():
+        seconds, peak = _measure(func, args, repeat)
+        results[name] = {
+            "seconds": seconds,
+            "tokens_per_s": n_tokens / seconds if seconds > 0 else float('inf'),
+            "peak_bytes": peak,
+        }
+    return results
+
+
+def run_parallel_benchmark(text: str, k: int = 3, workers: int = None) -> dict:
+    """
+    Times the serial shingle count (Counter of iter_shingles) against count_shingles_parallel on one text.
+
+    The CPU time of this process during the parallel count is the part which does not get faster with more
+    cores, so the parallel wall time cannot drop below it.
+
+    Args:
+        text (str): Text to count.
+        k (int): Size of the shingles.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+
+    Returns:
+        dict: "serial_s" and "parallel_s" wall times, "parent_cpu_s" CPU time of this process during the
+            parallel count, and "distinct" number of distinct shingles.
+    """
+    start = time.perf_counter()
+    serial = Counter(iter_shingles(read_chunks(io.StringIO(text)), k))
+    serial_s = time.perf_counter() - start
+    start, start_cpu = time.perf_counter(), time.process_time()
+    parallel = count_shingles_parallel(read_chunks(io.StringIO(text)), k, workers)
+    parallel_s, parent_cpu_s = time.perf_counter() - start, time.process_time() - start_cpu
+    if parallel != serial:
+        raise RuntimeError("The parallel count differs from the serial one.")
+    return {"serial_s": serial_s, "parallel_s": parallel_s, "parent_cpu_s": parent_cpu_s, "distinct": len(serial)}
+
+
+def compare_results(old: dict, new: dict, tolerance: float = 0.1) -> list:
+    """
+    Finds the stages whose throughput dropped by more than `tolerance` between two runs.
+
+    Args:
+        old (dict): Stage results of the reference run.
+        new (dict): Stage results of the new run.
+        tolerance (float): Allowed relative slowdown.
+
+    Returns:
+        list: (stage, old tokens/s, new tokens/s) of every regressed stage.
+    """
+    regressions = []
+    for stage, old_result in old.items():
+        if stage not in new:
+            continue
+        old_rate, new_rate = old_result["tokens_per_s"], new[stage]["tokens_per_s"]
+        if new_rate < old_rate * (1 - tolerance):
+            regressions.append((stage, old_rate, new_rate))
+    return regressions
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the Lab 3 shingling and similarity pipeline.")
+    parser.add_argument("--output", type=str, help="Write the results to this JSON file.")
+    parser.add_argument("--compare", type=str, nargs=2, metavar=("OLD", "NEW"),
+                        help="Compare two JSON results instead of running the benchmark.")
+    parser.add_argument("--tolerance", type=float, default=0.1, help="Allowed relative slowdown.")
+    parser.add_argument("--doc-length", type=int, default=100000, help="Number of tokens per document.")
+    parser.add_argument("--vocab-size", type=int, default=5000, help="Number of distinct words.")
+    parser.add_argument("--duplication-rate", type=float, default=0.5,
+                        help="Fraction of tokens shared between the documents.")
+    parser.add_argument("-k", type=int, default=3, help="Size of the shingles (k-grams).")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed calls per stage.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the synthetic corpus.")
+    parser.add_argument("--parallel-workers", type=int, default=None,
+                        help="Benchmark the parallel shingle count with this many workers instead.")
+    args = parser.parse_args()
+
+    if args.compare:
+        with open(args.compare[0]) as f1, open(args.compare[1]) as f2:
+            old, new = json.load(f1)["stages"], json.load(f2)["stages"]
+        regressions = compare_results(old, new, args.tolerance)
+        for stage, old_rate, new_rate in regressions:
+            print(f"REGRESSION {stage}: {old_rate:,.0f} -> {new_rate:,.0f} tokens/s")
+        if not regressions:
+            print("No regressions.")
+        sys.exit(1 if regressions else 0)
+
+    if args.parallel_workers is not None:
+        text = generate_corpus(1, args.doc_length, args.vocab_size, seed=args.seed)[0]
+        result = run_parallel_benchmark(text, args.k, args.parallel_workers)
+        print(f"{result['distinct']:,} distinct shingles")
+        print(f"serial:   {result['serial_s']:8.2f} s")
+        print(f"parallel: {result['parallel_s']:8.2f} s, {result['parent_cpu_s']:.2f} s CPU in this process")
+        return
+
+    documents = generate_corpus(2, args.doc_length, args.vocab_size, args.duplication_rate, args.seed)
+    stages = run_benchmark(documents, args.k, args.repeat)
+    for stage, result in stages.items():
+        print(f"{stage:>26}: {result['tokens_per_s']:>14,.0f} tokens/s, "
+              f"peak {result['peak_bytes'] / 1024 / 1024:8.1f} MB")
+    if args.output:
+        report = {
+            "config": {key: value for key, value in vars(args).items() if key not in ("output", "compare")},
+            "python": platform.python_version(),
+            "stages": stages,
+        }
+        with open(args.output, 'w') as f:
+            json.dump(report, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
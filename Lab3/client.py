@@ -0,0 +1,63 @@
+'''Lab 3 similarity query client
+Descriptions of the functions:
+    send_queries - sends a batch of queries to a running server.py and returns the results
+'''
+import argparse
+import json
+import os
+import socket
+
+
+def send_queries(socket_path: str, queries: list) -> list:
+    """
+    Sends a batch of queries to the similarity server in one request.
+
+    Args:
+        socket_path (str): Path of the server's Unix socket.
+        queries (list): Dictionaries with "text", "target", "k" and optionally "remove_punctuation"
+            and "hashed".
+
+    Returns:
+        list: One {"similarity": float} or {"error": message} dictionary per query.
+    Raises:
+        ValueError: If the server rejects the request.
+    """
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(socket_path)
+        sock.sendall(json.dumps({"queries": queries}).encode('utf-8') + b'\n')
+        with sock.makefile('rb') as f:
+            response = json.loads(f.readline())
+    if "error" in response:
+        raise ValueError(response["error"])
+    return response["results"]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Compare text files using a running similarity server.")
+    parser.add_argument("--socket", type=str, required=True, help="Path of the server's Unix socket.")
+    parser.add_argument("--query", type=str, nargs='+', required=True,
+                        help="Path to the query text file, several files are sent as one batch.")
+    parser.add_argument("--target", type=str, required=True, help="Path to the target text file.")
+    parser.add_argument("-k", type=int, required=True, help="Size of the shingles (k-grams).")
+    parser.add_argument("--remove_punctuation", action="store_true", help="Remove punctuation from text.")
+    parser.add_argument("--hashed", action="store_true", help="Compare 64-bit shingle hashes instead of strings.")
+    args = parser.parse_args()
+
+    # the server resolves paths relative to its own working directory
+    target = os.path.abspath(args.target)
+    queries = []
+    for path in args.query:
+        with open(path, 'r') as f:
+            queries.append({"text": f.read(), "target": target, "k": args.k,
+                            "remove_punctuation": args.remove_punctuation, "hashed": args.hashed})
+    results = send_queries(args.socket, queries)
+    for path, result in zip(args.query, results):
+        prefix = f"{path}: " if len(args.query) > 1 else ""
+        if "error" in result:
+            print(f"{prefix}Error: {result['error']}")
+        else:
+            print(f"{prefix}Jaccard similarity: {result['similarity']:.4f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,8 +1,29 @@
 import argparse
+import codecs
+import csv
+import glob
+import heapq
+import mmap
+import os
+import pickle
 import re
-from  a import shingles
+import warnings
+from collections import Counter
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import numpy as np
+from  a import iter_shingles, read_chunks, hashed_shingles, multi_k_shingles, multi_k_hashed_shingles, \
+    Vocabulary, encoded_shingles, iter_hashed_shingle_blocks
+from hyperloglog import HyperLogLog, estimate_jaccard_hll, DEFAULT_PRECISION
+from minhash import LSHIndex
+from shingle_cache import ShingleCache
+from simhash import SimHashIndex, simhash, hamming_distance
 
 
+# Bytes removed by the mmap path, the ASCII characters matched by preprocess_text's [^\w\s]
+PUNCTUATION_BYTES = bytes(c for c in range(128) if not (chr(c).isalnum() or chr(c) == '_' or chr(c).isspace()))
+# Number of bytes of a mapped file processed at once
+MMAP_WINDOW = 1 << 20
+
 
 def preprocess_text(text: str, remove_punctuation: bool) -> str:
     """
@@ -38,7 +59,32 @@ def jaccard_similarity(set1: set, set2: set) -> float:
     return len(intersection) / len(union)
 
 
-def compare_files(file1: str, file2: str, k: int, remove_punctuation: bool) -> float:
+def jaccard_similarity_hashed(hashes1: np.ndarray, hashes2: np.ndarray) -> float:
+    """
+    Calculates the Jaccard similarity between two sets of hashed shingles.
+    Works for any sorted arrays of unique values, e.g. unique encoded shingles (see a.encoded_shingles).
+
+    Args:
+        hashes1 (np.ndarray): First sorted array of unique hashes (see a.hashed_shingles).
+        hashes2 (np.ndarray): Second sorted array of unique hashes.
+
+    Returns:
+        float: Jaccard similarity (intersection / union).
+    Raises:
+        TypeError: If the inputs are not numpy arrays.
+        ValueError: If both inputs are empty.
+    """
+    if not isinstance(hashes1, np.ndarray) or not isinstance(hashes2, np.ndarray):
+        raise TypeError("Both inputs must be numpy arrays.")
+    if hashes1.size == 0 and hashes2.size == 0:
+        raise ValueError("At least one input must be non-empty.")
+    intersection = np.intersect1d(hashes1, hashes2, assume_unique=True).size
+    union = hashes1.size + hashes2.size - intersection
+    return intersection / union
+
+
+def compare_files(file1: str, file2: str, k: int, remove_punctuation: bool, hashed: bool = False,
+                  cache: ShingleCache = None, use_mmap: bool = False, encoded: bool = False) -> float:
     """
     Compare two files by calculating the Jaccard similarity of their k-shingles.
     Args :
@@ -46,36 +92,826 @@ def compare_files(file1: str, file2: str, k: int, remove_punctuation: bool) -> f
         file2 (str): Path to the second file.
         k (int): Size of the shingles (k-grams).
         remove_punctuation (bool): Whether to remove punctuation from text.
+        hashed (bool): Whether to compare 64-bit shingle hashes instead of shingle strings.
+        cache (ShingleCache): Optional on-disk cache of the shingles of both files.
+        use_mmap (bool): Whether to tokenise the memory-mapped bytes of the files (see mmap_chunks),
+            the cache is not used in this mode.
+        encoded (bool): Whether to compare shingles of integer token ids packed into integers
+            (exact, unlike hashed), the cache is not used in this mode.
     Returns :
         float: Jaccard similarity of the two files.
     Raises :
         ValueError: If one or both files are empty.
     """
-    with open(file1, 'r') as f1, open(file2, 'r') as f2:
-        text1 = preprocess_text(f1.read(), remove_punctuation)
-        text2 = preprocess_text(f2.read(), remove_punctuation)
+    if encoded:
+        return compare_files_encoded(file1, file2, k, remove_punctuation)
+    if use_mmap:
+        if hashed:
+            return jaccard_similarity_hashed(hashed_shingles(mmap_chunks(file1, remove_punctuation), k),
+                                             hashed_shingles(mmap_chunks(file2, remove_punctuation), k))
+        return jaccard_similarity(set(iter_shingles(mmap_chunks(file1, remove_punctuation), k)),
+                                  set(iter_shingles(mmap_chunks(file2, remove_punctuation), k)))
+    if hashed:
+        return jaccard_similarity_hashed(read_hashed_shingles(file1, k, remove_punctuation, cache),
+                                         read_hashed_shingles(file2, k, remove_punctuation, cache))
+    shingles1 = read_shingles(file1, k, remove_punctuation, cache)
+    shingles2 = read_shingles(file2, k, remove_punctuation, cache)
+    return jaccard_similarity(shingles1, shingles2)
 
-    # empty files check
-    if not text1 or not text2:
+
+
+def compare_files_encoded(file1: str, file2: str, k: int, remove_punctuation: bool) -> float:
+    """
+    Compare two files using shingles of vocabulary-encoded tokens.
+    Both files share one vocabulary, every shingle is k token ids packed into one integer.
+    Args :
+        file1 (str): Path to the first file.
+        file2 (str): Path to the second file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+    Returns :
+        float: Jaccard similarity of the two files.
+    Raises :
+        ValueError: If one or both files are empty or shorter than k words.
+    """
+    vocabulary = Vocabulary()
+    ids1 = vocabulary.encode_tokens(text_chunks(file1, remove_punctuation))
+    ids2 = vocabulary.encode_tokens(text_chunks(file2, remove_punctuation))
+    if len(ids1) == 0 or len(ids2) == 0:
         raise ValueError("One or both files are empty.")
+    # the packing width is only known once both files are encoded
+    shingles1 = np.unique(encoded_shingles(ids1, k, vocabulary.bits))
+    shingles2 = np.unique(encoded_shingles(ids2, k, vocabulary.bits))
+    return jaccard_similarity_hashed(shingles1, shingles2)
+
+
+def file_hyperloglog(path: str, k: int, remove_punctuation: bool, precision: int = DEFAULT_PRECISION,
+                     use_mmap: bool = False) -> HyperLogLog:
+    """
+    Streams the hashed k-shingles of a file into a HyperLogLog sketch.
+    Only one block of shingle hashes is held in memory at a time.
+    Args :
+        path (str): Path to the text file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        precision (int): Precision of the sketch, it has 2**precision one-byte registers.
+        use_mmap (bool): Whether to tokenise the memory-mapped bytes of the file (see mmap_chunks).
+    Returns :
+        HyperLogLog: Sketch of the shingles of the file.
+    Raises :
+        ValueError: If the file is empty or has fewer than k words.
+    """
+    sketch = HyperLogLog(precision)
+    chunks = mmap_chunks(path, remove_punctuation) if use_mmap else text_chunks(path, remove_punctuation)
+    for block in iter_hashed_shingle_blocks(chunks, [k]):
+        sketch.update(block[k])
+    return sketch
+
+
+def compare_files_hll(file1: str, file2: str, k: int, remove_punctuation: bool,
+                      precision: int = DEFAULT_PRECISION, use_mmap: bool = False) -> float:
+    """
+    Compare two files by estimating the Jaccard similarity of their k-shingles with HyperLogLog sketches.
+    The memory does not depend on the size of the files, see estimate_jaccard_hll for the accuracy.
+    Args :
+        file1 (str): Path to the first file.
+        file2 (str): Path to the second file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        precision (int): Precision of the sketches.
+        use_mmap (bool): Whether to tokenise the memory-mapped bytes of the files.
+    Returns :
+        float: Estimated Jaccard similarity of the two files.
+    Raises :
+        ValueError: If one or both files are empty.
+    """
+    return estimate_jaccard_hll(file_hyperloglog(file1, k, remove_punctuation, precision, use_mmap),
+                                file_hyperloglog(file2, k, remove_punctuation, precision, use_mmap))
+
+
+def text_chunks(path: str, remove_punctuation: bool):
+    """
+    Reads a text file chunk by chunk and preprocesses every chunk.
+    The file is never held in memory as a whole. Punctuation removal works character by character
+    and can be applied to each chunk separately.
+    Args :
+        path (str): Path to the text file.
+        remove_punctuation (bool): Whether to remove punctuation.
+    Returns :
+        generator: Preprocessed chunks of the file.
+    """
+    with open(path, 'r') as f:
+        for chunk in read_chunks(f):
+            yield preprocess_text(chunk, remove_punctuation)
+
+
+def compare_files_multi_k(file1: str, file2: str, ks, remove_punctuation: bool, hashed: bool = False,
+                          use_mmap: bool = False) -> dict:
+    """
+    Compare two files for several shingle sizes, reading and tokenising each file only once.
+    Args :
+        file1 (str): Path to the first file.
+        file2 (str): Path to the second file.
+        ks (iterable): Sizes of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        hashed (bool): Whether to compare 64-bit shingle hashes instead of shingle strings.
+        use_mmap (bool): Whether to tokenise the memory-mapped bytes of the files.
+    Returns :
+        dict: Jaccard similarity of the two files for every k.
+    Raises :
+        ValueError: If one or both files are empty or shorter than the largest k.
+    """
+    chunks = mmap_chunks if use_mmap else text_chunks
+    if hashed:
+        shingles1 = multi_k_hashed_shingles(chunks(file1, remove_punctuation), ks)
+        shingles2 = multi_k_hashed_shingles(chunks(file2, remove_punctuation), ks)
+        return {k: jaccard_similarity_hashed(shingles1[k], shingles2[k]) for k in shingles1}
+    shingles1 = multi_k_shingles(chunks(file1, remove_punctuation), ks)
+    shingles2 = multi_k_shingles(chunks(file2, remove_punctuation), ks)
+    return {k: jaccard_similarity(shingles1[k], shingles2[k]) for k in shingles1}
+
+
+def mmap_chunks(path: str, remove_punctuation: bool):
+    """
+    Memory-maps a file and yields its bytes window by window, without decoding them into a str.
+    Punctuation is deleted with bytes.translate, which gives the same result as preprocess_text
+    for ASCII text. Windows with non-ASCII bytes are decoded and go through preprocess_text instead.
+    Args :
+        path (str): Path to the text file.
+        remove_punctuation (bool): Whether to remove punctuation.
+    Returns :
+        generator: Byte windows of at most MMAP_WINDOW bytes.
+    Raises :
+        ValueError: If the file is empty.
+    """
+    # keeps a character cut by the end of a window for the next one, which then is not ASCII either
+    decoder = codecs.getincrementaldecoder('utf-8')()
+    with open(path, 'rb') as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            raise ValueError(f"{path} is empty.")
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            for offset in range(0, len(mapped), MMAP_WINDOW):
+                window = mapped[offset:offset + MMAP_WINDOW]
+                if hasattr(mapped, 'madvise'):
+                    # the window is copied, release the mapped pages so they do not add up in RSS
+                    start = offset - offset % mmap.PAGESIZE
+                    mapped.madvise(mmap.MADV_DONTNEED, start, offset + len(window) - start)
+                if not remove_punctuation:
+                    yield window
+                elif window.isascii():
+                    yield window.translate(None, PUNCTUATION_BYTES)
+                else:
+                    yield preprocess_text(decoder.decode(window), True).encode('utf-8')
+    decoder.decode(b'', final=True)
+
+
+def read_shingles(path: str, k: int, remove_punctuation: bool, cache: ShingleCache = None) -> set:
+    """
+    Reads a file and returns the set of its k-shingles.
+    Args :
+        path (str): Path to the text file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        cache (ShingleCache): Optional on-disk cache, looked up first and filled on a miss.
+    Returns :
+        set: Set of k-shingles of the file.
+    Raises :
+        ValueError: If the file is empty or has fewer than k words.
+    """
+    if cache is not None:
+        result = cache.get(path, k, remove_punctuation)
+        if result is not None:
+            return result
+    result = set(iter_shingles(text_chunks(path, remove_punctuation), k))
+    if cache is not None:
+        cache.put(path, k, remove_punctuation, result)
+    return result
+
+
+def read_hashed_shingles(path: str, k: int, remove_punctuation: bool, cache: ShingleCache = None) -> np.ndarray:
+    """
+    Reads a file and returns the sorted array of its unique 64-bit shingle hashes.
+    Args :
+        path (str): Path to the text file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        cache (ShingleCache): Optional on-disk cache, looked up first and filled on a miss.
+    Returns :
+        np.ndarray: Sorted unique uint64 shingle hashes.
+    Raises :
+        ValueError: If the file is empty or has fewer than k words.
+    """
+    if cache is not None:
+        result = cache.get(path, k, remove_punctuation, hashed=True)
+        if result is not None:
+            return result
+    result = hashed_shingles(text_chunks(path, remove_punctuation), k)
+    if cache is not None:
+        cache.put(path, k, remove_punctuation, result, hashed=True)
+    return result
+
+
+def list_files(directory: str) -> list:
+    """
+    Lists the regular files of a directory (not recursively).
+    Args :
+        directory (str): Path to the directory.
+    Returns :
+        list: Sorted paths of the files.
+    Raises :
+        ValueError: If directory is not a directory.
+    """
+    if not os.path.isdir(directory):
+        raise ValueError(f"{directory} is not a directory.")
+    paths = (os.path.join(directory, name) for name in sorted(os.listdir(directory)))
+    return [path for path in paths if os.path.isfile(path)]
 
-    shingles1 = set(shingles(text1, k))
-    shingles2 = set(shingles(text2, k))
-    return jaccard_similarity(shingles1, shingles2)
 
+def build_index(directory: str, k: int, remove_punctuation: bool, num_perm: int = 128, bands: int = 32,
+                cache: ShingleCache = None) -> LSHIndex:
+    """
+    Builds a MinHash LSH index over every file in a directory.
+    Files which are empty or shorter than k words are skipped with a warning.
+    Args :
+        directory (str): Path to the directory with the text files.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        num_perm (int): Length of the MinHash signatures.
+        bands (int): Number of LSH bands.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        LSHIndex: Index keyed by file path.
+    Raises :
+        ValueError: If directory is not a directory.
+    """
+    index = LSHIndex(k, remove_punctuation, num_perm, bands)
+    for path in list_files(directory):
+        try:
+            shingle_set = read_shingles(path, k, remove_punctuation, cache)
+        except (TypeError, ValueError) as e:
+            warnings.warn(f"Skipping {path}: {e}")
+            continue
+        index.add(path, index.signature(shingle_set))
+    return index
+
+
+def query_index(index: LSHIndex, file: str, threshold: float = 0.0, verify: bool = False,
+                cache: ShingleCache = None) -> list:
+    """
+    Finds the indexed files similar to a query file.
+    Args :
+        index (LSHIndex): Index built with `build_index`.
+        file (str): Path to the query file.
+        threshold (float): Minimal similarity of the returned files.
+        verify (bool): Whether to re-read the candidates and calculate their exact Jaccard similarity.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        list: (path, estimated similarity, exact similarity or None) tuples sorted from the most similar.
+    """
+    query_shingles = read_shingles(file, index.k, index.remove_punctuation, cache)
+    candidates = index.query(index.signature(query_shingles), 0.0 if verify else threshold)
+    if not verify:
+        return [(path, estimate, None) for path, estimate in candidates]
+
+    result = []
+    for path, estimate in candidates:
+        exact = jaccard_similarity(query_shingles, read_shingles(path, index.k, index.remove_punctuation, cache))
+        if exact >= threshold:
+            result.append((path, estimate, exact))
+    return sorted(result, key=lambda item: (-item[2], item[0]))
+
+
+def file_simhash(path: str, k: int, remove_punctuation: bool, weighted: bool = False,
+                 cache: ShingleCache = None) -> int:
+    """
+    Calculates the SimHash fingerprint of a file.
+    Args :
+        path (str): Path to the text file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        weighted (bool): Whether every shingle is weighted by its frequency.
+        cache (ShingleCache): Optional on-disk cache of the unweighted shingle sets.
+    Returns :
+        int: 64-bit fingerprint.
+    Raises :
+        ValueError: If the file is empty or has fewer than k words.
+    """
+    if weighted:
+        return simhash(Counter(iter_shingles(text_chunks(path, remove_punctuation), k)))
+    return simhash(read_shingles(path, k, remove_punctuation, cache))
+
+
+def build_simhash_index(directory: str, k: int, remove_punctuation: bool, weighted: bool = False,
+                        max_distance: int = 3, cache: ShingleCache = None) -> SimHashIndex:
+    """
+    Builds a SimHash index over every file in a directory.
+    Files which are empty or shorter than k words are skipped with a warning.
+    Args :
+        directory (str): Path to the directory with the text files.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        weighted (bool): Whether the fingerprints are TF weighted.
+        max_distance (int): Largest Hamming distance the index can be queried with.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        SimHashIndex: Index keyed by file path.
+    Raises :
+        ValueError: If directory is not a directory.
+    """
+    index = SimHashIndex(k, remove_punctuation, weighted, max_distance)
+    for path in list_files(directory):
+        try:
+            fingerprint = file_simhash(path, k, remove_punctuation, weighted, cache)
+        except (TypeError, ValueError) as e:
+            warnings.warn(f"Skipping {path}: {e}")
+            continue
+        index.add(path, fingerprint)
+    return index
+
+
+def query_simhash_index(index: SimHashIndex, file: str, distance: int = None, cache: ShingleCache = None) -> list:
+    """
+    Finds the indexed files whose fingerprints are within `distance` bits of a query file.
+    Args :
+        index (SimHashIndex): Index built with `build_simhash_index`.
+        file (str): Path to the query file.
+        distance (int): Largest Hamming distance, defaults to the max_distance of the index.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        list: (path, Hamming distance) pairs sorted from the closest.
+    """
+    fingerprint = file_simhash(file, index.k, index.remove_punctuation, index.weighted, cache)
+    return index.query(fingerprint, distance)
+
+
+# Shingles of the corpus, set once in every worker process by _init_worker
+_corpus_shingles = None
+
+
+def _init_worker(corpus_shingles: list):
+    global _corpus_shingles
+    _corpus_shingles = corpus_shingles
+
+
+def _read_corpus_file(job: tuple):
+    """Shingles one corpus file, returns None for files which cannot be shingled."""
+    path, k, remove_punctuation, hashed, cache = job
+    try:
+        if hashed:
+            return read_hashed_shingles(path, k, remove_punctuation, cache)
+        return read_shingles(path, k, remove_punctuation, cache)
+    except (TypeError, ValueError):
+        return None
+
+
+def _similarity_row(job: tuple) -> list:
+    """Non-zero similarities of document i with every later document, only those >= min_sim."""
+    i, min_sim = job
+    similarity = jaccard_similarity_hashed if isinstance(_corpus_shingles[i], np.ndarray) else jaccard_similarity
+    row = []
+    for j in range(i + 1, len(_corpus_shingles)):
+        value = similarity(_corpus_shingles[i], _corpus_shingles[j])
+        if value > 0 and value >= min_sim:
+            row.append((i, j, value))
+    return row
+
+
+def all_pairs_similarity(directory: str, k: int, remove_punctuation: bool, min_sim: float = 0.0,
+                         hashed: bool = False, workers: int = None, cache: ShingleCache = None) -> tuple:
+    """
+    Calculates the Jaccard similarity of every pair of files in a directory.
+    Every file is read and shingled exactly once, the pairs are compared in a process pool.
+    Files which are empty or shorter than k words are skipped with a warning.
+    Args :
+        directory (str): Path to the directory with the text files.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        min_sim (float): Only pairs with at least this similarity are returned, pairs with no
+            shared shingles are never returned.
+        hashed (bool): Whether to compare 64-bit shingle hashes instead of shingle strings.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        tuple: List of file paths and a list of (i, j, similarity) entries with i < j,
+            the upper triangle of a sparse similarity matrix.
+    Raises :
+        ValueError: If directory is not a directory or min_sim is not in [0, 1].
+    """
+    if not 0.0 <= min_sim <= 1.0:
+        raise ValueError("min_sim must be between 0 and 1.")
+    paths = list_files(directory)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        loaded = list(executor.map(_read_corpus_file, [(path, k, remove_punctuation, hashed, cache) for path in paths]))
+
+    files, corpus_shingles = [], []
+    for path, file_shingles in zip(paths, loaded):
+        if file_shingles is None:
+            warnings.warn(f"Skipping {path}: empty or shorter than k words.")
+            continue
+        files.append(path)
+        corpus_shingles.append(file_shingles)
+
+    pairs = []
+    n_workers = workers or os.cpu_count() or 1
+    chunksize = max(1, len(files) // (4 * n_workers))
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker, initargs=(corpus_shingles,)) as executor:
+        for row in executor.map(_similarity_row, [(i, min_sim) for i in range(len(files))], chunksize=chunksize):
+            pairs.extend(row)
+    return files, pairs
+
+
+def write_similarity_matrix(path: str, files: list, pairs: list):
+    """
+    Writes a sparse similarity matrix as CSV, one "file1,file2,similarity" row per stored pair.
+    Args :
+        path (str): Path to the output file.
+        files (list): File paths, indexed by the matrix entries.
+        pairs (list): (i, j, similarity) entries.
+    """
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(["file1", "file2", "similarity"])
+        for i, j, similarity in pairs:
+            writer.writerow([files[i], files[j], f"{similarity:.6f}"])
+
+
+def _is_glob(pattern: str) -> bool:
+    """True if `pattern` is not an existing path and contains glob characters."""
+    return not os.path.exists(pattern) and any(c in pattern for c in '*?[')
+
+
+def expand_targets(patterns) -> list:
+    """
+    Expands target paths and glob patterns into a list of files.
+    Args :
+        patterns (list): File paths or glob patterns (e.g. "corpus/*.txt"). An existing path is taken
+            as is, even if it contains glob characters (e.g. "notes[1].txt").
+    Returns :
+        list: Paths of the matching files, in the order of the patterns, without duplicates.
+    Raises :
+        ValueError: If a pattern matches no file.
+    """
+    paths = []
+    for pattern in patterns:
+        if _is_glob(pattern):
+            matches = sorted(path for path in glob.glob(pattern) if os.path.isfile(path))
+            if not matches:
+                raise ValueError(f"{pattern} matches no file.")
+            paths.extend(matches)
+        else:
+            paths.append(pattern)
+    return list(dict.fromkeys(paths))
+
+
+# Shingles of the query, set once in every worker process by _init_query_worker
+_query_shingles = None
+
+
+def _init_query_worker(query_shingles):
+    global _query_shingles
+    _query_shingles = query_shingles
+
+
+def _target_similarity(job: tuple) -> tuple:
+    """Reads and shingles one target and compares it with the query, the similarity is None on failure."""
+    path, k, remove_punctuation, hashed, cache = job
+    try:
+        target_shingles = _read_corpus_file(job)
+    except OSError:
+        return path, None
+    if target_shingles is None:
+        return path, None
+    if hashed:
+        return path, jaccard_similarity_hashed(_query_shingles, target_shingles)
+    return path, jaccard_similarity(_query_shingles, target_shingles)
+
+
+def iter_target_similarities(query: str, targets: list, k: int, remove_punctuation: bool, hashed: bool = False,
+                             workers: int = None, cache: ShingleCache = None):
+    """
+    Compares one query file with many targets, yielding every result as soon as it is ready.
+    The query is read and shingled once and sent to every worker process, the targets are read and
+    shingled concurrently by the workers and only the similarities come back.
+    Targets which cannot be read or are shorter than k words are skipped with a warning.
+    Args :
+        query (str): Path to the query file.
+        targets (list): Paths to the target files.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        hashed (bool): Whether to compare 64-bit shingle hashes instead of shingle strings.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        cache (ShingleCache): Optional on-disk shingle cache.
+    Returns :
+        generator: (path, similarity) tuples in the order of completion.
+    Raises :
+        ValueError: If the query file is empty or has fewer than k words.
+    """
+    if hashed:
+        query_shingles = read_hashed_shingles(query, k, remove_punctuation, cache)
+    else:
+        query_shingles = read_shingles(query, k, remove_punctuation, cache)
+    with ProcessPoolExecutor(max_workers=workers, initializer=_init_query_worker,
+                             initargs=(query_shingles,)) as executor:
+        futures = [executor.submit(_target_similarity, (path, k, remove_punctuation, hashed, cache))
+                   for path in targets]
+        for future in as_completed(futures):
+            path, similarity = future.result()
+            if similarity is None:
+                warnings.warn(f"Skipping {path}: unreadable, empty or shorter than k words.")
+                continue
+            yield path, similarity
+
+
+def compare_query_to_targets(query: str, targets: list, k: int, remove_punctuation: bool, hashed: bool = False,
+                             workers: int = None, cache: ShingleCache = None, top: int = None) -> list:
+    """
+    Compares one query file with many targets, see iter_target_similarities.
+    Args :
+        top (int): Only return the `top` most similar targets, all of them by default.
+    Returns :
+        list: (path, similarity) tuples sorted from the most similar.
+    Raises :
+        ValueError: If top is not positive, or the query file is empty or has fewer than k words.
+    """
+    if top is not None and top <= 0:
+        raise ValueError("top must be positive.")
+    results = iter_target_similarities(query, targets, k, remove_punctuation, hashed, workers, cache)
+    key = lambda item: (-item[1], item[0])
+    if top is not None:
+        return heapq.nsmallest(top, results, key=key)
+    return sorted(results, key=key)
+
+
+class IncrementalComparison:
+    """Jaccard similarity of a growing (append-only) file and a fixed reference file.
+
+    Every update reads only the bytes appended since the previous one. The shingles of the
+    complete tokens are kept together with the last k-1 tokens and the unfinished last token,
+    so shingles spanning the old end of the file are formed correctly. The intersection size with
+    the reference is updated as new shingles arrive. The file is re-read from the start when it
+    was replaced or truncated, and the intersection is recounted when the reference changes.
+    The result equals compare_files for files with '\\n' line endings.
+
+    Attributes:
+        path (str): Path to the growing file.
+        target (str): Path to the reference file.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        offset (int): Number of bytes of the file already processed.
+    """
+
+    def __init__(self, path: str, target: str, k: int, remove_punctuation: bool = False):
+        """Creates a comparison that has not read anything yet.
+
+        Raises:
+            ValueError: If k is not a positive integer.
+        """
+        if not isinstance(k, int) or k <= 0:
+            raise ValueError("k must be a positive integer.")
+        self.path = path
+        self.target = target
+        self.k = k
+        self.remove_punctuation = remove_punctuation
+        self._reference = set()
+        self._reference_version = None
+        self._reset()
+
+    def _reset(self):
+        self.offset = 0
+        self._inode = None
+        self._decoder = codecs.getincrementaldecoder('utf-8')()
+        self._shingles = set()
+        self._intersection = 0
+        # last k-1 complete tokens and the (possibly unfinished) last token
+        self._tail = []
+        self._partial = None
+
+    def _load_reference(self):
+        stat = os.stat(self.target)
+        version = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if version != self._reference_version:
+            self._reference = read_shingles(self.target, self.k, self.remove_punctuation)
+            self._reference_version = version
+            self._intersection = len(self._shingles & self._reference)
+
+    def _add_shingle(self, shingle: str):
+        if shingle not in self._shingles:
+            self._shingles.add(shingle)
+            if shingle in self._reference:
+                self._intersection += 1
+
+    def _add_text(self, text: str):
+        parts = preprocess_text(text, self.remove_punctuation).split(' ')
+        if self._partial is not None:
+            parts[0] = self._partial + parts[0]
+        self._partial = parts.pop()
+        for token in parts:
+            self._tail.append(token)
+            if len(self._tail) == self.k:
+                self._add_shingle(" ".join(self._tail))
+            if len(self._tail) >= self.k:
+                del self._tail[0]
+
+    def update(self) -> float:
+        """
+        Reads the bytes appended since the last update and returns the current similarity.
+
+        Returns:
+            float: Jaccard similarity of the file and the reference.
+        Raises:
+            ValueError: If one of the files is empty or shorter than k words.
+        """
+        stat = os.stat(self.path)
+        if stat.st_ino != self._inode or stat.st_size < self.offset:
+            self._reset()
+            self._inode = stat.st_ino
+        self._load_reference()
+
+        with open(self.path, 'rb') as f:
+            f.seek(self.offset)
+            for block in iter(lambda: f.read(MMAP_WINDOW), b''):
+                # a character cut at the end of a block stays in the decoder until the next block
+                self._add_text(self._decoder.decode(block))
+                self.offset += len(block)
+
+        if self._partial is None:
+            raise ValueError(f"{self.path} is empty.")
+        # shingle ending with the unfinished last token, counted only until the token is complete
+        last = self._tail + [self._partial]
+        size, intersection = len(self._shingles), self._intersection
+        if len(last) == self.k:
+            last_shingle = " ".join(last)
+            if last_shingle not in self._shingles:
+                size += 1
+                intersection += last_shingle in self._reference
+        if size == 0:
+            raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+        return intersection / (size + len(self._reference) - intersection)
+
+    def save(self, path: str):
+        """Writes the state to `path`."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'IncrementalComparison':
+        """Reads a state written by `save`.
+
+        Raises:
+            TypeError: If the file does not contain an IncrementalComparison.
+        """
+        with open(path, 'rb') as f:
+            state = pickle.load(f)
+        if not isinstance(state, IncrementalComparison):
+            raise TypeError(f"{path} does not contain an IncrementalComparison.")
+        return state
 
 
 def main():
     parser = argparse.ArgumentParser(description="Compare two text files using Jaccard similarity.")
-    parser.add_argument("--query", type=str, required=True, help="Path to the query text file.")
-    parser.add_argument("--target", type=str, required=True, help="Path to the target text file.")
-    parser.add_argument("-k", type=int, required=True, help="Size of the shingles (k-grams).")
+    parser.add_argument("--query", type=str, help="Path to the query text file.")
+    parser.add_argument("--target", type=str, nargs='+',
+                        help="Path to the target text file, several paths or glob patterns compare the query with each.")
+    parser.add_argument("--top", type=int, default=None, help="Only print the N most similar targets.")
+    parser.add_argument("-k", type=int, help="Size of the shingles (k-grams).")
+    parser.add_argument("--k-range", type=int, nargs=2, metavar=("K_MIN", "K_MAX"),
+                        help="Print the similarity for every k from K_MIN to K_MAX (instead of -k).")
     parser.add_argument("--remove_punctuation", action="store_true", help="Remove punctuation from text.")
+    parser.add_argument("--hashed", action="store_true", help="Compare 64-bit shingle hashes instead of strings.")
+    parser.add_argument("--encoded", action="store_true",
+                        help="Compare shingles of integer-encoded tokens instead of strings.")
+    parser.add_argument("--hll", action="store_true",
+                        help="Estimate the similarity with HyperLogLog sketches in constant memory.")
+    parser.add_argument("--hll-precision", type=int, default=DEFAULT_PRECISION,
+                        help="Precision of the HyperLogLog sketches (2**precision bytes each).")
+    parser.add_argument("--mmap", action="store_true", help="Tokenise the memory-mapped bytes of the files.")
+    parser.add_argument("--incremental", type=str, metavar="STATE",
+                        help="Keep the state of an append-only query file in STATE and only read what was appended.")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Directory of the persistent shingle cache.")
+    parser.add_argument("--cache-size", type=int, default=256, help="Maximal size of the shingle cache in MB.")
+    # MinHash LSH mode
+    parser.add_argument("--build-index", type=str, metavar="DIR",
+                        help="Build a MinHash LSH index over the files in DIR and save it to --index.")
+    parser.add_argument("--index", type=str, help="Path to the MinHash LSH index file.")
+    parser.add_argument("--num-perm", type=int, default=128, help="Length of the MinHash signatures.")
+    parser.add_argument("--bands", type=int, default=32, help="Number of LSH bands.")
+    parser.add_argument("--threshold", type=float, default=0.0, help="Minimal similarity of the reported files.")
+    parser.add_argument("--verify", action="store_true", help="Verify LSH candidates with the exact Jaccard similarity.")
+    # SimHash mode
+    parser.add_argument("--simhash", action="store_true",
+                        help="Compare 64-bit SimHash fingerprints, also selects a SimHash index for --build-index/--index.")
+    parser.add_argument("--tf-weighted", action="store_true", help="Weight the SimHash shingles by their frequency.")
+    parser.add_argument("--max-distance", type=int, default=3, help="Largest Hamming distance of the SimHash index.")
+    # All-pairs mode
+    parser.add_argument("--corpus", type=str, metavar="DIR",
+                        help="Compare every pair of files in DIR and write the sparse matrix to --output.")
+    parser.add_argument("--output", type=str, help="Path to the output CSV of the all-pairs mode.")
+    parser.add_argument("--min-sim", type=float, default=0.0, help="Only write pairs with at least this similarity.")
+    parser.add_argument("--workers", type=int, default=None, help="Number of worker processes.")
     args = parser.parse_args()
+    cache = ShingleCache(args.cache_dir, args.cache_size * 1024 * 1024) if args.cache_dir else None
+
+    if args.corpus:
+        if not args.output or args.k is None:
+            parser.error("--corpus requires --output and -k")
+        files, pairs = all_pairs_similarity(args.corpus, args.k, args.remove_punctuation, args.min_sim,
+                                            args.hashed, args.workers, cache)
+        write_similarity_matrix(args.output, files, pairs)
+        print(f"Wrote {len(pairs)} pairs of {len(files)} files.")
+        return
+
+    if args.build_index:
+        if not args.index or args.k is None:
+            parser.error("--build-index requires --index and -k")
+        if args.simhash:
+            index = build_simhash_index(args.build_index, args.k, args.remove_punctuation, args.tf_weighted,
+                                        args.max_distance, cache)
+            index.save(args.index)
+            print(f"Indexed {len(index)} files.")
+            return
+        index = build_index(args.build_index, args.k, args.remove_punctuation, args.num_perm, args.bands, cache)
+        index.save(args.index)
+        print(f"Indexed {len(index)} files.")
+        return
+
+    if args.index:
+        if not args.query:
+            parser.error("--index requires --query")
+        if args.simhash:
+            index = SimHashIndex.load(args.index)
+            for path, distance in query_simhash_index(index, args.query, min(args.max_distance, index.max_distance),
+                                                      cache):
+                print(f"{path}: Hamming distance {distance}")
+            return
+        index = LSHIndex.load(args.index)
+        for path, estimate, exact in query_index(index, args.query, args.threshold, args.verify, cache):
+            if exact is None:
+                print(f"{path}: estimated Jaccard similarity {estimate:.4f}")
+            else:
+                print(f"{path}: estimated Jaccard similarity {estimate:.4f}, exact {exact:.4f}")
+        return
+
+    if args.target and (len(args.target) > 1 or args.top is not None or _is_glob(args.target[0])):
+        if not args.query or args.k is None:
+            parser.error("--query and -k are required")
+        if args.k_range or args.incremental or args.simhash or args.hll or args.encoded or args.mmap:
+            parser.error("several targets can only be compared with the default or --hashed mode")
+        try:
+            targets = expand_targets(args.target)
+        except ValueError as e:
+            parser.error(str(e))
+        for path, similarity in compare_query_to_targets(args.query, targets, args.k, args.remove_punctuation,
+                                                         args.hashed, args.workers, cache, args.top):
+            print(f"{path}: Jaccard similarity: {similarity:.4f}")
+        return
+    target = args.target[0] if args.target else None
+
+    if args.k_range:
+        if not args.query or not target:
+            parser.error("--k-range requires --query and --target")
+        k_min, k_max = args.k_range
+        if not 0 < k_min <= k_max:
+            parser.error("--k-range requires 0 < K_MIN <= K_MAX")
+        if cache:
+            parser.error("--k-range does not use the shingle cache, drop --cache-dir")
+        similarities = compare_files_multi_k(args.query, target, range(k_min, k_max + 1),
+                                             args.remove_punctuation, args.hashed, args.mmap)
+        for k, similarity in similarities.items():
+            print(f"k={k}: Jaccard similarity: {similarity:.4f}")
+        return
+
+    if not args.query or not target or args.k is None:
+        parser.error("--query, --target and -k are required")
+
+    if args.simhash:
+        fingerprint1 = file_simhash(args.query, args.k, args.remove_punctuation, args.tf_weighted, cache)
+        fingerprint2 = file_simhash(target, args.k, args.remove_punctuation, args.tf_weighted, cache)
+        print(f"SimHash: {fingerprint1:016x} {fingerprint2:016x}")
+        print(f"Hamming distance: {hamming_distance(fingerprint1, fingerprint2)}")
+        return
+    if args.hll:
+        similarity = compare_files_hll(args.query, target, args.k, args.remove_punctuation,
+                                       args.hll_precision, args.mmap)
+        print(f"Estimated Jaccard similarity: {similarity:.4f}")
+        return
 
-    similarity = compare_files(args.query, args.target, args.k, args.remove_punctuation)
+    if args.incremental:
+        comparison = None
+        if os.path.exists(args.incremental):
+            comparison = IncrementalComparison.load(args.incremental)
+            settings = (comparison.path, comparison.target, comparison.k, comparison.remove_punctuation)
+            if settings != (args.query, target, args.k, args.remove_punctuation):
+                comparison = None
+        if comparison is None:
+            comparison = IncrementalComparison(args.query, target, args.k, args.remove_punctuation)
+        similarity = comparison.update()
+        comparison.save(args.incremental)
+        print(f"Jaccard similarity: {similarity:.4f}")
+        return
+    similarity = compare_files(args.query, target, args.k, args.remove_punctuation, args.hashed, cache,
+                               args.mmap, args.encoded)
     print(f"Jaccard similarity: {similarity:.4f}")
 
 
 if __name__ == "__main__":
-    main()
\ No newline at end of file
+    main()
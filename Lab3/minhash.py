@@ -0,0 +1,183 @@
+'''Lab 3 MinHash signatures and LSH index
+Descriptions of the functions:
+    minhash_signature - MinHash signature of a set of shingles
+    estimate_jaccard - estimated Jaccard similarity of two signatures
+    LSHIndex - banded LSH index over MinHash signatures
+'''
+import hashlib
+import pickle
+
+import numpy as np
+
+# Mersenne prime used by the universal hash family (a * x + b) mod p
+_MERSENNE_PRIME = np.uint64((1 << 61) - 1)
+_MAX_HASH = np.uint64((1 << 32) - 1)
+# Number of shingles hashed at once, keeps the (rows x num_perm) matrix small
+_BLOCK_SIZE = 4096
+
+
+def _hash_shingle(shingle: str) -> int:
+    """Stable 32-bit hash of a shingle (Python's hash() is salted per process)."""
+    return int.from_bytes(hashlib.blake2b(shingle.encode('utf-8'), digest_size=4).digest(), 'little')
+
+
+def _permutations(num_perm: int, seed: int) -> tuple:
+    """Draws the (a, b) coefficients of num_perm hash functions."""
+    rng = np.random.default_rng(seed)
+    a = rng.integers(1, 1 << 32, size=num_perm, dtype=np.uint64)
+    b = rng.integers(0, 1 << 32, size=num_perm, dtype=np.uint64)
+    return a, b
+
+
+def minhash_signature(shingle_set: set, num_perm: int = 128, seed: int = 1) -> np.ndarray:
+    """
+    Calculates the MinHash signature of a set of shingles.
+
+    Args:
+        shingle_set (set): Set of shingles (strings).
+        num_perm (int): Number of hash functions (length of the signature).
+        seed (int): Seed of the hash functions, signatures are only comparable for the same seed.
+
+    Returns:
+        np.ndarray: Signature of `num_perm` unsigned integers.
+    Raises:
+        TypeError: If shingle_set is not a set.
+        ValueError: If shingle_set is empty or num_perm is not positive.
+    """
+    if not isinstance(shingle_set, set):
+        raise TypeError("shingle_set must be a set.")
+    if len(shingle_set) == 0:
+        raise ValueError("shingle_set cannot be empty.")
+    if not isinstance(num_perm, int) or num_perm <= 0:
+        raise ValueError("num_perm must be a positive integer.")
+
+    a, b = _permutations(num_perm, seed)
+    hashes = np.fromiter((_hash_shingle(s) for s in shingle_set), dtype=np.uint64, count=len(shingle_set))
+    signature = np.full(num_perm, _MAX_HASH, dtype=np.uint64)
+    for start in range(0, len(hashes), _BLOCK_SIZE):
+        block = hashes[start:start + _BLOCK_SIZE, np.newaxis]
+        permuted = ((block * a + b) % _MERSENNE_PRIME) & _MAX_HASH
+        np.minimum(signature, permuted.min(axis=0), out=signature)
+    return signature
+
+
+def estimate_jaccard(signature1: np.ndarray, signature2: np.ndarray) -> float:
+    """
+    Estimates the Jaccard similarity of two sets from their MinHash signatures.
+
+    Args:
+        signature1 (np.ndarray): First signature.
+        signature2 (np.ndarray): Second signature.
+
+    Returns:
+        float: Fraction of positions where the signatures agree.
+    Raises:
+        ValueError: If the signatures have different lengths.
+    """
+    if len(signature1) != len(signature2):
+        raise ValueError("Signatures must have the same length.")
+    return float(np.mean(signature1 == signature2))
+
+
+class LSHIndex:
+    """Banded locality-sensitive hashing index over MinHash signatures.
+
+    The signature is cut into `bands` bands of `num_perm // bands` rows. Two documents
+    become candidates when at least one band is identical, so a query only looks at
+    the buckets it falls into instead of the whole corpus.
+
+    Attributes:
+        k (int): Size of the shingles used to build the signatures.
+        remove_punctuation (bool): Whether punctuation was removed before shingling.
+        num_perm (int): Length of the signatures.
+        bands (int): Number of bands.
+        seed (int): Seed of the MinHash functions.
+        signatures (dict): Signature of every indexed key.
+    """
+
+    def __init__(self, k: int, remove_punctuation: bool = False, num_perm: int = 128, bands: int = 32,
+                 seed: int = 1):
+        """Creates an empty index.
+
+        Raises:
+            ValueError: If num_perm or bands are not positive or num_perm is not divisible by bands.
+        """
+        if not isinstance(num_perm, int) or num_perm <= 0:
+            raise ValueError("num_perm must be a positive integer.")
+        if not isinstance(bands, int) or bands <= 0 or num_perm % bands != 0:
+            raise ValueError("bands must be a positive divisor of num_perm.")
+        self.k = k
+        self.remove_punctuation = remove_punctuation
+        self.num_perm = num_perm
+        self.bands = bands
+        self.seed = seed
+        self.rows = num_perm // bands
+        self.signatures = {}
+        self._buckets = [{} for _ in range(bands)]
+
+    def __len__(self) -> int:
+        return len(self.signatures)
+
+    def _band_keys(self, signature: np.ndarray):
+        for band in range(self.bands):
+            yield band, signature[band * self.rows:(band + 1) * self.rows].tobytes()
+
+    def signature(self, shingle_set: set) -> np.ndarray:
+        """Calculates a signature compatible with this index."""
+        return minhash_signature(shingle_set, self.num_perm, self.seed)
+
+    def add(self, key: str, signature: np.ndarray):
+        """Adds a signature to the index under `key`.
+
+        Raises:
+            ValueError: If the key is already indexed or the signature has the wrong length.
+        """
+        if key in self.signatures:
+            raise ValueError(f"Key {key!r} is already in the index.")
+        if len(signature) != self.num_perm:
+            raise ValueError("Signature length does not match num_perm.")
+        self.signatures[key] = signature
+        for band, band_key in self._band_keys(signature):
+            self._buckets[band].setdefault(band_key, []).append(key)
+
+    def candidates(self, signature: np.ndarray) -> set:
+        """Returns the keys sharing at least one band with `signature`."""
+        result = set()
+        for band, band_key in self._band_keys(signature):
+            result.update(self._buckets[band].get(band_key, ()))
+        return result
+
+    def query(self, signature: np.ndarray, threshold: float = 0.0) -> list:
+        """Finds candidate keys and their estimated Jaccard similarity.
+
+        Args:
+            signature (np.ndarray): Signature of the query.
+            threshold (float): Minimal estimated similarity of the returned candidates.
+
+        Returns:
+            list: (key, estimated similarity) pairs sorted from the most similar.
+        """
+        result = []
+        for key in self.candidates(signature):
+            estimate = estimate_jaccard(signature, self.signatures[key])
+            if estimate >= threshold:
+                result.append((key, estimate))
+        return sorted(result, key=lambda item: (-item[1], item[0]))
+
+    def save(self, path: str):
+        """Writes the index to `path`."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'LSHIndex':
+        """Reads an index written by `save`.
+
+        Raises:
+            TypeError: If the file does not contain an LSHIndex.
+        """
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, LSHIndex):
+            raise TypeError(f"{path} does not contain an LSHIndex.")
+        return index
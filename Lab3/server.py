@@ -0,0 +1,208 @@
+'''Lab 3 similarity query server
+Descriptions of the functions:
+    ReferenceStore - shingles of reference documents kept in memory, the least recently used evicted first
+    compare_text - Jaccard similarity of a query text with a stored reference document
+    start_server - starts the asyncio server on a Unix socket
+Protocol: one JSON object per line. A request {"queries": [{"text": ..., "target": ..., "k": ...,
+"remove_punctuation": ..., "hashed": ...}, ...]} is answered with {"results": [...]}, where every
+result is {"similarity": float} or {"error": message}. The similarities are calculated in a thread pool,
+so a large request does not hold up the other connections.
+'''
+import argparse
+import asyncio
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from a import iter_shingles, hashed_shingles
+from compare import preprocess_text, jaccard_similarity, jaccard_similarity_hashed, read_shingles, \
+    read_hashed_shingles, list_files
+from shingle_cache import ShingleCache
+
+# Number of reference documents kept in memory by default
+MAX_DOCUMENTS = 1024
+
+
+class ReferenceStore:
+    """Shingle sets (or hashed arrays) of reference documents, loaded once and kept in memory.
+
+    A document is read again only when its mtime or size changes. At most max_documents documents are kept,
+    the least recently used one is dropped (and read again if it is asked for later). The store can be
+    used from several threads.
+
+    Attributes:
+        cache (ShingleCache): Optional on-disk cache used when a document is (re)loaded.
+        max_documents (int): Maximal number of documents kept in memory.
+    """
+
+    def __init__(self, cache: ShingleCache = None, max_documents: int = MAX_DOCUMENTS):
+        """Creates an empty store.
+
+        Raises:
+            ValueError: If max_documents is not a positive integer.
+        """
+        if not isinstance(max_documents, int) or max_documents <= 0:
+            raise ValueError("max_documents must be a positive integer.")
+        self.cache = cache
+        self.max_documents = max_documents
+        self._documents = OrderedDict()
+        self._lock = threading.Lock()
+
+    def __len__(self) -> int:
+        return len(self._documents)
+
+    def get(self, path: str, k: int, remove_punctuation: bool, hashed: bool = False):
+        """Returns the shingles of a reference document, reading it only on the first use or after a change.
+
+        Raises:
+            OSError: If the document cannot be read.
+            ValueError: If the document is empty or shorter than k words.
+        """
+        key = (os.path.abspath(path), k, remove_punctuation, hashed)
+        stat = os.stat(path)
+        version = (stat.st_mtime_ns, stat.st_size)
+        with self._lock:
+            stored = self._documents.get(key)
+            if stored is not None and stored[0] == version:
+                self._documents.move_to_end(key)
+                return stored[1]
+        # read outside of the lock, two threads may read the same document once each
+        if hashed:
+            value = read_hashed_shingles(path, k, remove_punctuation, self.cache)
+        else:
+            value = read_shingles(path, k, remove_punctuation, self.cache)
+        with self._lock:
+            self._documents[key] = (version, value)
+            self._documents.move_to_end(key)
+            while len(self._documents) > self.max_documents:
+                self._documents.popitem(last=False)
+        return value
+
+    def preload(self, directory: str, k: int, remove_punctuation: bool, hashed: bool = False) -> int:
+        """Loads every file of a directory, skipping the ones which cannot be shingled.
+
+        Returns:
+            int: Number of loaded documents.
+        """
+        loaded = 0
+        for path in list_files(directory):
+            try:
+                self.get(path, k, remove_punctuation, hashed)
+                loaded += 1
+            except (OSError, ValueError):
+                continue
+        return loaded
+
+
+def compare_text(store: ReferenceStore, text: str, target: str, k: int, remove_punctuation: bool = False,
+                 hashed: bool = False) -> float:
+    """
+    Calculates the Jaccard similarity of a query text and a reference document.
+
+    Args:
+        store (ReferenceStore): Store holding the reference documents.
+        text (str): Query text.
+        target (str): Path to the reference document.
+        k (int): Size of the shingles (k-grams).
+        remove_punctuation (bool): Whether to remove punctuation from text.
+        hashed (bool): Whether to compare 64-bit shingle hashes instead of shingle strings.
+
+    Returns:
+        float: Jaccard similarity.
+    Raises:
+        TypeError: If text is not a string.
+        ValueError: If text is empty or shorter than k words.
+    """
+    if not isinstance(text, str):
+        raise TypeError("text must be a string.")
+    text = preprocess_text(text, remove_punctuation)
+    if not text:
+        raise ValueError("Query text is empty.")
+    reference = store.get(target, k, remove_punctuation, hashed)
+    if hashed:
+        return jaccard_similarity_hashed(hashed_shingles([text], k), reference)
+    return jaccard_similarity(set(iter_shingles([text], k)), reference)
+
+
+def _answer(store: ReferenceStore, query: dict) -> dict:
+    try:
+        similarity = compare_text(store, query["text"], query["target"], query["k"],
+                                  query.get("remove_punctuation", False), query.get("hashed", False))
+    except (KeyError, TypeError, ValueError, OSError) as e:
+        return {"error": f"{type(e).__name__}: {e}"}
+    return {"similarity": similarity}
+
+
+def _answer_all(store: ReferenceStore, queries: list) -> dict:
+    return {"results": [_answer(store, query) for query in queries]}
+
+
+async def _handle_client(store: ReferenceStore, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+    loop = asyncio.get_running_loop()
+    try:
+        while line := await reader.readline():
+            try:
+                queries = json.loads(line)["queries"]
+                if not isinstance(queries, list) or not all(isinstance(query, dict) for query in queries):
+                    raise TypeError("queries must be a list of objects")
+            except (ValueError, KeyError, TypeError) as e:
+                response = {"error": f"Malformed request: {e}"}
+            else:
+                # the shingling runs in the default thread pool, the event loop keeps serving other clients
+                response = await loop.run_in_executor(None, _answer_all, store, queries)
+            writer.write(json.dumps(response).encode('utf-8') + b'\n')
+            await writer.drain()
+    finally:
+        writer.close()
+
+
+async def start_server(socket_path: str, store: ReferenceStore) -> asyncio.AbstractServer:
+    """
+    Starts answering requests on a Unix socket.
+
+    Args:
+        socket_path (str): Path of the Unix socket, an existing socket file is replaced.
+        store (ReferenceStore): Store holding the reference documents.
+
+    Returns:
+        asyncio.AbstractServer: The running server.
+    """
+    if os.path.exists(socket_path):
+        os.unlink(socket_path)
+    return await asyncio.start_unix_server(lambda reader, writer: _handle_client(store, reader, writer),
+                                           path=socket_path, limit=1 << 26)
+
+
+async def _serve(socket_path: str, store: ReferenceStore):
+    server = await start_server(socket_path, store)
+    print(f"Serving {len(store)} reference documents on {socket_path}")
+    async with server:
+        await server.serve_forever()
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve Jaccard similarity queries over a Unix socket.")
+    parser.add_argument("--socket", type=str, required=True, help="Path of the Unix socket.")
+    parser.add_argument("--preload", type=str, metavar="DIR", help="Load the reference documents of DIR at startup.")
+    parser.add_argument("-k", type=int, help="Size of the shingles of the preloaded documents.")
+    parser.add_argument("--remove_punctuation", action="store_true", help="Remove punctuation from preloaded text.")
+    parser.add_argument("--hashed", action="store_true", help="Preload 64-bit shingle hashes instead of strings.")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Directory of the persistent shingle cache.")
+    parser.add_argument("--max-documents", type=int, default=MAX_DOCUMENTS,
+                        help="Number of reference documents kept in memory, the least recently used are dropped.")
+    args = parser.parse_args()
+
+    store = ReferenceStore(ShingleCache(args.cache_dir) if args.cache_dir else None, args.max_documents)
+    if args.preload:
+        if args.k is None:
+            parser.error("--preload requires -k")
+        store.preload(args.preload, args.k, args.remove_punctuation, args.hashed)
+    try:
+        asyncio.run(_serve(args.socket, store))
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,15 @@
 import argparse
+import heapq
+import os
 import sys
-from collections import Counter
-from a import shingles
+from collections import Counter, deque
+from concurrent.futures import ProcessPoolExecutor
+from itertools import chain
+import numpy as np
+from a import iter_shingles, read_chunks, Vocabulary, encoded_shingles
+
+# Number of characters counted by one worker task of count_shingles_parallel
+SEGMENT_SIZE = 1 << 22
 
 # The advice of the use of the Counter class was taken from ChatGPT for the prompt "Find the most common k-shingles
 # in the input text."
@@ -11,21 +19,261 @@ def counter_shingles(arr: list[str]) -> dict:
     Counts the frequencies of elements in `arr`.
 
     Args:
-        arr (list): A list of strings.
+        arr (list or np.ndarray): A list of strings, or encoded shingles (see a.encoded_shingles)
+            as a list of integers or an array.
 
     Returns:
-        dict: A dictionary where keys are strings, and values are their frequencies.
+        dict: A dictionary where keys are strings (or encoded shingles), and values are their frequencies.
     Raises:
-        TypeError: If arr is not a list of strings.
+        TypeError: If arr is not a list of strings or of integers, or an array.
     """
-    if not isinstance(arr, list) or  len(arr) == 0 or not all(isinstance(x, str) for x in arr):
+    if isinstance(arr, np.ndarray) and arr.ndim == 1 and len(arr) > 0:
+        # encoded shingles are counted by sorting instead of hashing every one of them, then put in
+        # first-seen order, so ties in most_common come out like Counter(list)
+        values, first, counts = np.unique(arr, return_index=True, return_counts=True)
+        order = np.argsort(first, kind='stable')
+        return Counter(dict(zip(values[order].tolist(), counts[order].tolist())))
+    if not isinstance(arr, list) or  len(arr) == 0 or not (all(isinstance(x, str) for x in arr) or
+                                                           all(isinstance(x, int) for x in arr)):
         raise TypeError("arr must be a list of strings.")
     return Counter(arr)
 
+class SpaceSaving:
+    """Approximate counts of the most frequent items of a stream in fixed memory (Space-Saving algorithm).
+
+    At most `capacity` items are tracked. When a new item arrives and the table is full, the item with
+    the smallest count is replaced and the new item inherits that count as its possible error.
+    Every reported count over-estimates the true count by at most its error, and every item whose true
+    count exceeds total / capacity is guaranteed to be tracked.
+
+    Attributes:
+        capacity (int): Maximal number of tracked items.
+        total (int): Number of items seen so far.
+    """
+
+    def __init__(self, capacity: int):
+        """Creates an empty summary.
+
+        Args:
+            capacity (int): Maximal number of tracked items.
+
+        Raises:
+            ValueError: If capacity is not a positive integer.
+        """
+        if not isinstance(capacity, int) or capacity <= 0:
+            raise ValueError("Capacity must be a positive integer.")
+        self.capacity = capacity
+        self.total = 0
+        self._counts = {}
+        self._errors = {}
+        # (count, item) entries, stale entries are skipped lazily and dropped on rebuild
+        self._heap = []
+
+    def __len__(self) -> int:
+        return len(self._counts)
+
+    def _rebuild_heap(self):
+        self._heap = [(count, item) for item, count in self._counts.items()]
+        heapq.heapify(self._heap)
+
+    def _pop_min(self) -> tuple:
+        while True:
+            count, item = heapq.heappop(self._heap)
+            if self._counts.get(item) == count:
+                return count, item
+
+    def update(self, item: str):
+        """Counts one occurrence of `item`."""
+        self.total += 1
+        if item in self._counts:
+            self._counts[item] += 1
+        elif len(self._counts) < self.capacity:
+            self._counts[item] = 1
+            self._errors[item] = 0
+        else:
+            min_count, min_item = self._pop_min()
+            del self._counts[min_item]
+            del self._errors[min_item]
+            self._counts[item] = min_count + 1
+            self._errors[item] = min_count
+        heapq.heappush(self._heap, (self._counts[item], item))
+        if len(self._heap) > 4 * self.capacity:
+            self._rebuild_heap()
+
+    def error_bound(self) -> int:
+        """Largest possible over-estimation of any reported count (never more than total / capacity)."""
+        if len(self._counts) < self.capacity:
+            return 0
+        return min(self._counts.values())
+
+    def most_common(self, n: int) -> list:
+        """Returns the n items with the highest estimated counts.
+
+        Returns:
+            list: (item, estimated count, error) tuples, the true count lies in [count - error, count].
+        """
+        top = heapq.nlargest(n, self._counts.items(), key=lambda entry: entry[1])
+        return [(item, count, self._errors[item]) for item, count in top]
+
+
+def _count_segment(job: tuple) -> tuple:
+    """Counts the k-shingles ending in a segment of text, given the last k-1 tokens before it.
+
+    Returns:
+        tuple: (Counter of the shingles, number of tokens of the segment).
+    """
+    tail, segment, k = job
+    segment_tokens = segment.split(' ')
+    tokens = tail + segment_tokens
+    return Counter(map(' '.join, zip(*(tokens[j:len(tokens) - k + 1 + j] for j in range(k))))), len(segment_tokens)
+
+
+def _iter_segments(chunks, segment_size: int):
+    """Joins the chunks into segments of about segment_size characters, cut at a space.
+
+    The text is the segments joined with single spaces, so no token is cut by a segment boundary.
+    """
+    parts = []
+    length = 0
+    seen = False
+    for chunk in chunks:
+        if not chunk:
+            continue
+        seen = True
+        parts.append(chunk)
+        length += len(chunk)
+        if length >= segment_size:
+            text = ''.join(parts)
+            start = 0
+            while len(text) - start >= segment_size:
+                cut = text.rfind(' ', start, start + segment_size)
+                if cut < 0:
+                    # a token longer than a segment, it ends the segment
+                    cut = text.find(' ', start + segment_size)
+                    if cut < 0:
+                        break
+                yield text[start:cut]
+                start = cut + 1
+            parts = [text[start:]]
+            length = len(parts[0])
+    if seen:
+        yield ''.join(parts)
+
+
+def count_shingles_parallel(chunks, k: int, workers: int = None, segment_size: int = SEGMENT_SIZE) -> Counter:
+    """
+    Counts the k-shingles of text given in chunks in a pool of worker processes.
+
+    The text is cut at spaces into segments of about segment_size characters, which the workers split into
+    tokens and count themselves. Every segment is sent together with the last k-1 tokens before it, so each
+    shingle is counted exactly once, in the segment holding its last token. This process only adds up the
+    Counters of the segments, so it does no work per token, only per distinct shingle of a segment.
+    The result (including the order of equal counts) is the same as Counter(iter_shingles(chunks, k)).
+
+    Args:
+        chunks (iterable): Iterable of strings.
+        k (int): Length of each shingle.
+        workers (int): Number of worker processes, defaults to the number of CPUs.
+        segment_size (int): Number of characters per segment.
+
+    Returns:
+        Counter: Frequencies of the shingles.
+    Raises:
+        ValueError: If k or segment_size are not positive or k is greater than the number of words.
+    """
+    if not isinstance(k, int) or k <= 0:
+        raise ValueError("Length of shingles (k) must be positive.")
+    if not isinstance(segment_size, int) or segment_size <= 0:
+        raise ValueError("Segment size must be positive.")
+
+    total = Counter()
+    n_tokens = 0
+    # at most a few segments per worker are in flight, so memory does not grow with the input
+    max_pending = 2 * (workers or os.cpu_count() or 1)
+
+    def add_counts(future):
+        nonlocal n_tokens
+        counts, segment_tokens = future.result()
+        # the segments are added in order, so new shingles are inserted in the order of the serial count
+        total.update(counts)
+        n_tokens += segment_tokens
+
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        pending = deque()
+        tail = []
+        for segment in _iter_segments(chunks, segment_size):
+            pending.append(executor.submit(_count_segment, (tail, segment, k)))
+            if k > 1:
+                # last k-1 tokens, found from the end of the segment without splitting all of it
+                parts = segment.rsplit(' ', k - 1)
+                tail = (tail + (parts[1:] if len(parts) == k else parts))[-(k - 1):]
+            if len(pending) >= max_pending:
+                add_counts(pending.popleft())
+        while pending:
+            add_counts(pending.popleft())
+    if n_tokens < k:
+        raise ValueError("k must be less than or equal to the number of words in t and greater than 0")
+    return total
+
+
+def strip_chunks(chunks):
+    """
+    Strips leading and trailing whitespace from text given in chunks, like str.strip() on the joined text.
+
+    Args:
+        chunks (iterable): Iterable of strings.
+
+    Returns:
+        generator: Stripped chunks, nothing if the text is only whitespace.
+    """
+    pending = ''
+    started = False
+    for chunk in chunks:
+        if not started:
+            chunk = chunk.lstrip()
+            if not chunk:
+                continue
+            started = True
+        body = chunk.rstrip()
+        if body:
+            # whitespace is only emitted once something follows it
+            yield pending + body
+            pending = chunk[len(body):]
+        else:
+            pending += chunk
+
+
+def print_most_common(shingles_count: Counter, n: int):
+    """Prints the n most common shingles with their frequencies."""
+    most_common = shingles_count.most_common(n)
+
+    print()
+     # Print results
+    for phrase, frequency in most_common:
+        print(f"{phrase}: {frequency}")
+
+
+def print_approximate(summary: SpaceSaving, n: int):
+    """Prints the top n shingles of a SpaceSaving summary with their error bounds."""
+    print()
+    print(f"After {summary.total} shingles, counts over-estimated by at most {summary.error_bound()}:")
+    for phrase, frequency, error in summary.most_common(n):
+        print(f"{phrase}: {frequency} (true count >= {frequency - error})")
+    sys.stdout.flush()
+
+
 def main():
     parser = argparse.ArgumentParser(description="Find the most common k-shingles in the input text.")
     parser.add_argument('-n', type=int, required=True, help="Number of most common shingles to display.")
     parser.add_argument('-k', type=int, required=True, help="Length of each shingle.")
+    parser.add_argument('--workers', type=int, default=None,
+                        help="Count the shingles exactly in this many worker processes.")
+    parser.add_argument('--encoded', action='store_true',
+                        help="Count integer-encoded shingles, decoding only the displayed ones.")
+    parser.add_argument('--capacity', type=int, default=None,
+                        help="Approximate the counts in fixed memory, tracking at most this many shingles.")
+    parser.add_argument('--snapshot-every', type=int, default=None,
+                        help="With --capacity, print the current top n after every this many shingles.")
     args = parser.parse_args()
 
     # Input validation
@@ -33,22 +281,48 @@ def main():
         raise ValueError("Number of most common shingles (-n) must be positive.")
     if args.k <= 0:
         raise ValueError("Length of shingles (-k) must be positive.")
+    if args.snapshot_every is not None and (args.capacity is None or args.snapshot_every <= 0):
+        raise ValueError("--snapshot-every must be positive and requires --capacity.")
+    if args.encoded and (args.workers is not None or args.capacity is not None):
+        raise ValueError("--encoded cannot be combined with --workers or --capacity.")
+    if args.workers is not None and (args.workers <= 0 or args.capacity is not None):
+        raise ValueError("--workers must be positive and cannot be combined with --capacity.")
 
-    # Read multiline input until EOF
-    input_text = sys.stdin.read().strip()
-    if not input_text:
+    # Read multiline input chunk by chunk until EOF
+    chunks = strip_chunks(read_chunks(sys.stdin))
+    first_chunk = next(chunks, None)
+    if first_chunk is None:
         raise ValueError("Input text cannot be empty.")
 
-        # Generate shingles and count frequencies
-    k_shingles = shingles(input_text, args.k)
-    shingles_count = counter_shingles(k_shingles)
+    if args.encoded:
+        vocabulary = Vocabulary()
+        token_ids = vocabulary.encode_tokens(chain([first_chunk], chunks))
+        shingles_count = counter_shingles(encoded_shingles(token_ids, args.k, vocabulary.bits))
+        print()
+        for shingle, frequency in shingles_count.most_common(args.n):
+            print(f"{vocabulary.decode(shingle, args.k, vocabulary.bits)}: {frequency}")
+        return
+
+    if args.workers is not None:
+        shingles_count = count_shingles_parallel(chain([first_chunk], chunks), args.k, args.workers)
+        print_most_common(shingles_count, args.n)
+        return
+
+    shingle_stream = iter_shingles(chain([first_chunk], chunks), args.k)
+    if args.capacity is not None:
+        summary = SpaceSaving(args.capacity)
+        for shingle in shingle_stream:
+            summary.update(shingle)
+            if args.snapshot_every and summary.total % args.snapshot_every == 0:
+                print_approximate(summary, args.n)
+        print_approximate(summary, args.n)
+        return
+
+    # Generate shingles lazily and count frequencies
+    shingles_count = Counter(shingle_stream)
+    print_most_common(shingles_count, args.n)
 
-    most_common = shingles_count.most_common(args.n)
 
-    print()
-     # Print results
-    for phrase, frequency in most_common:
-        print(f"{phrase}: {frequency}")
 
 if __name__ == "__main__":
     main()
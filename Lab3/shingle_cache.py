@@ -0,0 +1,148 @@
+'''Lab 3 persistent shingle cache
+Descriptions of the functions:
+    ShingleCache - on-disk cache of the shingles of text files
+'''
+import hashlib
+import json
+import os
+import pickle
+import tempfile
+
+import numpy as np
+
+# Number of bytes read at once when hashing a file
+_READ_SIZE = 1 << 20
+
+
+def _atomic_write(path: str, write):
+    """Writes a file through a temporary file, so readers never see a partial entry."""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix='.tmp')
+    try:
+        with os.fdopen(fd, 'wb') as f:
+            write(f)
+        os.replace(tmp_path, path)
+    except BaseException:
+        os.unlink(tmp_path)
+        raise
+
+
+class ShingleCache:
+    """On-disk cache of shingle sets and hashed shingle arrays of text files.
+
+    Entries are keyed by the hash of the file content, k, the punctuation flag and the
+    representation, so a file moved or copied elsewhere still hits the cache. The content hash
+    of every path is remembered together with the file's mtime and size and recomputed only
+    when one of them changes. When the entries take more than `max_bytes`, the least recently
+    used ones are removed.
+
+    Attributes:
+        directory (str): Directory of the cache.
+        max_bytes (int): Maximal total size of the entries.
+    """
+
+    def __init__(self, directory: str, max_bytes: int = 256 * 1024 * 1024):
+        """Opens (and creates if needed) a cache directory.
+
+        Raises:
+            ValueError: If max_bytes is not a positive integer.
+        """
+        if not isinstance(max_bytes, int) or max_bytes <= 0:
+            raise ValueError("max_bytes must be a positive integer.")
+        self.directory = directory
+        self.max_bytes = max_bytes
+        self._entries_dir = os.path.join(directory, 'entries')
+        self._stats_dir = os.path.join(directory, 'stats')
+        os.makedirs(self._entries_dir, exist_ok=True)
+        os.makedirs(self._stats_dir, exist_ok=True)
+
+    def content_hash(self, path: str) -> str:
+        """Returns the hash of a file's content, reusing the stored one while mtime and size are unchanged."""
+        stat = os.stat(path)
+        path_key = hashlib.blake2b(os.path.abspath(path).encode('utf-8'), digest_size=16).hexdigest()
+        stat_path = os.path.join(self._stats_dir, path_key + '.json')
+        try:
+            with open(stat_path, 'r') as f:
+                record = json.load(f)
+            if record['mtime_ns'] == stat.st_mtime_ns and record['size'] == stat.st_size:
+                return record['content_hash']
+        except (OSError, ValueError, KeyError):
+            pass
+
+        digest = hashlib.blake2b(digest_size=16)
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(_READ_SIZE), b''):
+                digest.update(block)
+        record = {'mtime_ns': stat.st_mtime_ns, 'size': stat.st_size, 'content_hash': digest.hexdigest()}
+        _atomic_write(stat_path, lambda f: f.write(json.dumps(record).encode('utf-8')))
+        return record['content_hash']
+
+    def _entry_path(self, path: str, k: int, remove_punctuation: bool, hashed: bool) -> str:
+        suffix = '.npy' if hashed else '.pkl'
+        name = f"{self.content_hash(path)}-k{k}-p{int(remove_punctuation)}{suffix}"
+        return os.path.join(self._entries_dir, name)
+
+    def get(self, path: str, k: int, remove_punctuation: bool, hashed: bool = False):
+        """Returns the cached shingles of a file, or None if they are not cached.
+
+        Args:
+            path (str): Path to the text file.
+            k (int): Size of the shingles (k-grams).
+            remove_punctuation (bool): Whether punctuation was removed from text.
+            hashed (bool): Whether to look for the hashed array instead of the shingle set.
+
+        Returns:
+            set or np.ndarray or None: Cached shingles.
+        """
+        entry = self._entry_path(path, k, remove_punctuation, hashed)
+        try:
+            if hashed:
+                value = np.load(entry)
+            else:
+                with open(entry, 'rb') as f:
+                    value = pickle.load(f)
+        except (OSError, ValueError, EOFError, pickle.UnpicklingError):
+            return None
+        # mark the entry as recently used
+        try:
+            os.utime(entry)
+        except FileNotFoundError:
+            pass
+        return value
+
+    def put(self, path: str, k: int, remove_punctuation: bool, value, hashed: bool = False):
+        """Stores the shingles of a file and evicts the least recently used entries above max_bytes.
+
+        Args:
+            path (str): Path to the text file.
+            k (int): Size of the shingles (k-grams).
+            remove_punctuation (bool): Whether punctuation was removed from text.
+            value (set or np.ndarray): Shingle set, or hashed array when hashed is True.
+            hashed (bool): Whether value is a hashed array.
+        """
+        entry = self._entry_path(path, k, remove_punctuation, hashed)
+        if hashed:
+            _atomic_write(entry, lambda f: np.save(f, value))
+        else:
+            _atomic_write(entry, lambda f: pickle.dump(value, f, protocol=pickle.HIGHEST_PROTOCOL))
+        self.evict()
+
+    def size(self) -> int:
+        """Total size of the entries in bytes."""
+        return sum(entry.stat().st_size for entry in os.scandir(self._entries_dir) if entry.is_file())
+
+    def evict(self):
+        """Removes the least recently used entries until they take at most max_bytes."""
+        entries = []
+        for entry in os.scandir(self._entries_dir):
+            if entry.is_file() and not entry.name.endswith('.tmp'):
+                stat = entry.stat()
+                entries.append((stat.st_mtime_ns, stat.st_size, entry.path))
+        total = sum(size for _, size, _ in entries)
+        for _, size, path in sorted(entries):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.unlink(path)
+            except FileNotFoundError:
+                pass
+            total -= size
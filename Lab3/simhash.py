@@ -0,0 +1,161 @@
+'''Lab 3 SimHash fingerprints and Hamming-distance index
+Descriptions of the functions:
+    simhash - 64-bit SimHash fingerprint of a set (or weighted counts) of shingles
+    hamming_distance - number of differing bits of two fingerprints
+    SimHashIndex - finds all stored fingerprints within a Hamming distance of a query
+'''
+import hashlib
+import pickle
+
+import numpy as np
+
+FINGERPRINT_BITS = 64
+# Number of shingles processed at once, keeps the (rows x 64) bit matrix small
+_BLOCK_SIZE = 4096
+_BIT_SHIFTS = np.arange(FINGERPRINT_BITS, dtype=np.uint64)
+
+
+def _hash_shingle(shingle) -> int:
+    """Stable 64-bit hash of a shingle (str or bytes)."""
+    if isinstance(shingle, str):
+        shingle = shingle.encode('utf-8')
+    return int.from_bytes(hashlib.blake2b(shingle, digest_size=8).digest(), 'little')
+
+
+def simhash(features) -> int:
+    """
+    Calculates the SimHash fingerprint of a document.
+
+    Every shingle votes for each bit of its hash with its weight, the fingerprint keeps the bits
+    with a positive total. Similar documents get fingerprints with a small Hamming distance.
+
+    Args:
+        features (set or dict): Set of shingles (all weighted 1), or a mapping of shingles to weights
+            such as the result of counter_shingles for TF weighting.
+
+    Returns:
+        int: 64-bit fingerprint.
+    Raises:
+        TypeError: If features is not a set or a dict.
+        ValueError: If features is empty.
+    """
+    if not isinstance(features, (set, dict)):
+        raise TypeError("features must be a set or a dict.")
+    if len(features) == 0:
+        raise ValueError("features cannot be empty.")
+    keys = list(features)
+    if isinstance(features, dict):
+        weights = np.fromiter((features[key] for key in keys), dtype=np.float64, count=len(keys))
+    else:
+        weights = np.ones(len(keys), dtype=np.float64)
+    hashes = np.fromiter((_hash_shingle(key) for key in keys), dtype=np.uint64, count=len(keys))
+
+    votes = np.zeros(FINGERPRINT_BITS, dtype=np.float64)
+    for start in range(0, len(hashes), _BLOCK_SIZE):
+        bits = (hashes[start:start + _BLOCK_SIZE, np.newaxis] >> _BIT_SHIFTS) & np.uint64(1)
+        votes += bits.T.astype(np.float64) @ weights[start:start + _BLOCK_SIZE]
+    # a set bit gets +weight, a cleared bit -weight
+    votes = 2 * votes - weights.sum()
+    return sum(1 << bit for bit in range(FINGERPRINT_BITS) if votes[bit] > 0)
+
+
+def hamming_distance(fingerprint1: int, fingerprint2: int) -> int:
+    """Returns the number of bits in which two fingerprints differ."""
+    return bin(fingerprint1 ^ fingerprint2).count('1')
+
+
+class SimHashIndex:
+    """Index of SimHash fingerprints answering "all fingerprints within distance d" queries.
+
+    The 64 bits are cut into d + 1 blocks and every block has its own table. Two fingerprints
+    differing in at most d bits agree completely on at least one block, so the candidates of a
+    query are the fingerprints sharing one of its blocks, checked afterwards with the exact distance.
+
+    Attributes:
+        k (int): Size of the shingles used to build the fingerprints.
+        remove_punctuation (bool): Whether punctuation was removed before shingling.
+        weighted (bool): Whether the fingerprints are TF weighted.
+        max_distance (int): Largest Hamming distance a query can ask for.
+        fingerprints (dict): Fingerprint of every indexed key.
+    """
+
+    def __init__(self, k: int, remove_punctuation: bool = False, weighted: bool = False, max_distance: int = 3):
+        """Creates an empty index.
+
+        Raises:
+            ValueError: If max_distance is not between 0 and 63.
+        """
+        if not isinstance(max_distance, int) or not 0 <= max_distance < FINGERPRINT_BITS:
+            raise ValueError("max_distance must be an integer between 0 and 63.")
+        self.k = k
+        self.remove_punctuation = remove_punctuation
+        self.weighted = weighted
+        self.max_distance = max_distance
+        self.fingerprints = {}
+        n_blocks = max_distance + 1
+        edges = [FINGERPRINT_BITS * i // n_blocks for i in range(n_blocks + 1)]
+        self._blocks = [(edges[i], (1 << (edges[i + 1] - edges[i])) - 1) for i in range(n_blocks)]
+        self._tables = [{} for _ in range(n_blocks)]
+
+    def __len__(self) -> int:
+        return len(self.fingerprints)
+
+    def _block_keys(self, fingerprint: int):
+        for table, (shift, mask) in zip(self._tables, self._blocks):
+            yield table, (fingerprint >> shift) & mask
+
+    def add(self, key: str, fingerprint: int):
+        """Adds a fingerprint to the index under `key`.
+
+        Raises:
+            ValueError: If the key is already indexed.
+        """
+        if key in self.fingerprints:
+            raise ValueError(f"Key {key!r} is already in the index.")
+        self.fingerprints[key] = fingerprint
+        for table, block in self._block_keys(fingerprint):
+            table.setdefault(block, []).append(key)
+
+    def query(self, fingerprint: int, distance: int = None) -> list:
+        """Finds every indexed fingerprint within `distance` bits of `fingerprint`.
+
+        Args:
+            fingerprint (int): Fingerprint of the query.
+            distance (int): Largest Hamming distance, defaults to max_distance.
+
+        Returns:
+            list: (key, distance) pairs sorted from the closest.
+        Raises:
+            ValueError: If distance is larger than max_distance.
+        """
+        if distance is None:
+            distance = self.max_distance
+        if distance > self.max_distance:
+            raise ValueError("distance cannot be larger than the max_distance of the index.")
+        candidates = set()
+        for table, block in self._block_keys(fingerprint):
+            candidates.update(table.get(block, ()))
+        result = []
+        for key in candidates:
+            key_distance = hamming_distance(fingerprint, self.fingerprints[key])
+            if key_distance <= distance:
+                result.append((key, key_distance))
+        return sorted(result, key=lambda item: (item[1], item[0]))
+
+    def save(self, path: str):
+        """Writes the index to `path`."""
+        with open(path, 'wb') as f:
+            pickle.dump(self, f, protocol=pickle.HIGHEST_PROTOCOL)
+
+    @staticmethod
+    def load(path: str) -> 'SimHashIndex':
+        """Reads an index written by `save`.
+
+        Raises:
+            TypeError: If the file does not contain a SimHashIndex.
+        """
+        with open(path, 'rb') as f:
+            index = pickle.load(f)
+        if not isinstance(index, SimHashIndex):
+            raise TypeError(f"{path} does not contain a SimHashIndex.")
+        return index
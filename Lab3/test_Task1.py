@@ -1,6 +1,28 @@
-from a import shingles
-from shingle import counter_shingles
-from compare import preprocess_text, jaccard_similarity, compare_files
+import io
+import pathlib
+import tempfile
+import a
+import compare
+import server
+import threading
+import time
+from a import shingles, iter_shingles, read_chunks, hashed_shingles, multi_k_shingles, multi_k_hashed_shingles, \
+    Vocabulary, encoded_shingles, iter_hashed_shingle_blocks
+import numpy as np
+from collections import Counter
+from shingle import counter_shingles, strip_chunks, SpaceSaving, count_shingles_parallel
+from compare import preprocess_text, jaccard_similarity, jaccard_similarity_hashed, compare_files, build_index, query_index, \
+    all_pairs_similarity, write_similarity_matrix, compare_files_multi_k, IncrementalComparison, \
+    build_simhash_index, query_simhash_index, compare_files_hll, file_hyperloglog, expand_targets, compare_query_to_targets
+from minhash import minhash_signature, estimate_jaccard, LSHIndex
+from shingle_cache import ShingleCache
+from benchmark import generate_corpus, run_benchmark, compare_results, run_parallel_benchmark
+from server import ReferenceStore, compare_text, start_server
+from client import send_queries
+from simhash import simhash, hamming_distance, SimHashIndex
+from hyperloglog import HyperLogLog, estimate_jaccard_hll
+import asyncio
+import os
 import pytest
 
 # Part A tests
@@ -39,6 +61,69 @@ def test_shingles_with_valid_input():
     assert shingles("This is a test. This is only a test", 2) == ['This is', 'is a', 'a test.',
                                                                   'test. This', 'This is', 'is only',
                                                                   'only a', 'a test']
+
+def test_iter_shingles_matches_shingles():
+    """ Test that streaming shingles match shingles for every chunk size """
+    text = "This is a test.  This is only a test\nwith a second line"
+    for chunk_size in (1, 2, 3, 7, 100):
+        for k in (1, 2, 3):
+            chunks = read_chunks(io.StringIO(text), chunk_size)
+            assert list(iter_shingles(chunks, k)) == shingles(text, k)
+
+def test_iter_shingles_invalid_input():
+    """ Test iter_shingles function with invalid input """
+    with pytest.raises(ValueError):
+        list(iter_shingles(["hello world"], 3))
+    with pytest.raises(ValueError):
+        list(iter_shingles([], 1))
+    with pytest.raises(ValueError):
+        list(iter_shingles(["hello world"], 0))
+    with pytest.raises(TypeError):
+        list(iter_shingles(["hello world"], "2"))
+    with pytest.raises(ValueError):
+        read_chunks(io.StringIO("hello"), 0)
+
+def test_strip_chunks():
+    """ Test that strip_chunks behaves like str.strip """
+    text = "  \n hello  world \n\n  again  \n "
+    for chunk_size in (1, 2, 5, 100):
+        assert "".join(strip_chunks(read_chunks(io.StringIO(text), chunk_size))) == text.strip()
+    assert list(strip_chunks(["  ", "\n"])) == []
+
+def test_multi_k_shingles(monkeypatch):
+    """ Test that multi-k shingling matches shingling once per k """
+    text = "a b c a b c  d a b c a b e a b c d"
+    result = multi_k_shingles(read_chunks(io.StringIO(text), 3), range(1, 6))
+    hashed = multi_k_hashed_shingles(read_chunks(io.StringIO(text), 3), [5, 1, 2, 3, 4])
+    monkeypatch.setattr(a, "HASH_BLOCK_SIZE", 2)
+    hashed_blocks = multi_k_hashed_shingles([text], range(1, 6))
+    for k in range(1, 6):
+        assert result[k] == set(shingles(text, k))
+        assert list(hashed[k]) == list(hashed_shingles([text], k))
+        assert list(hashed_blocks[k]) == list(hashed[k])
+    with pytest.raises(ValueError):
+        multi_k_shingles(["a b"], [1, 3])
+    with pytest.raises(ValueError):
+        multi_k_hashed_shingles(["a b"], [])
+    with pytest.raises(TypeError):
+        multi_k_shingles(["a b"], [1, "2"])
+
+def test_encoded_shingles():
+    """ Test that encoded shingles decode to the string shingles """
+    text = "This is a test. This is only a test"
+    vocabulary = Vocabulary()
+    token_ids = vocabulary.encode_tokens(read_chunks(io.StringIO(text), 4))
+    assert len(vocabulary) == 6
+    for k in (1, 2, 3):
+        for bits in (vocabulary.bits, 40):
+            encoded = encoded_shingles(token_ids, k, bits)
+            assert [vocabulary.decode(shingle, k, bits) for shingle in encoded] == shingles(text, k)
+    assert encoded_shingles(token_ids, 2, 40).dtype == object
+    with pytest.raises(ValueError):
+        encoded_shingles(token_ids, 20, vocabulary.bits)
+    with pytest.raises(TypeError):
+        encoded_shingles(token_ids, "2", vocabulary.bits)
+
 # Part B tests  for counter_shingles function
 
 def test_counter_shingles_with_valid_input():
@@ -49,6 +134,19 @@ def test_counter_shingles_with_valid_input():
                                                                                     'only a': 1, 'a test': 1}
     assert counter_shingles(shingles("Hello world", 2)) == {"Hello world": 1}
 
+def test_counter_shingles_with_encoded_input():
+    """ Test counter_shingles function with encoded shingles """
+    text = "This is a test. This is only a test"
+    vocabulary = Vocabulary()
+    encoded = encoded_shingles(vocabulary.encode_tokens([text]), 2, vocabulary.bits)
+    expected = counter_shingles(shingles(text, 2))
+    for arr in (encoded, encoded.tolist()):
+        counts = counter_shingles(arr)
+        assert {vocabulary.decode(shingle, 2, vocabulary.bits): n for shingle, n in counts.items()} == expected
+        # ties keep the first-seen order of the text
+        assert [vocabulary.decode(shingle, 2, vocabulary.bits) for shingle, _ in counts.most_common()] == \
+            [shingle for shingle, _ in expected.most_common()]
+
 def test_counter_shingles_with_invalid_input():
     """ Test counter_shingles function with invalid input """
     with pytest.raises(TypeError):
@@ -64,12 +162,63 @@ def test_counter_shingles_with_invalid_input():
 
 
 
+def test_space_saving_exact_when_under_capacity():
+    """ Test SpaceSaving gives exact counts while all items fit """
+    arr = shingles("This is a test. This is only a test", 2)
+    summary = SpaceSaving(100)
+    for item in arr:
+        summary.update(item)
+    assert summary.error_bound() == 0
+    assert [(item, count) for item, count, _ in summary.most_common(1)] == [("This is", 2)]
+
+def test_space_saving_error_bounds():
+    """ Test SpaceSaving bounds on a skewed stream """
+    stream = (["heavy"] * 50 + [f"rare{i}" for i in range(10)]) * 20
+    summary = SpaceSaving(8)
+    for item in stream:
+        summary.update(item)
+    true_counts = Counter(stream)
+    assert len(summary) == 8
+    assert summary.error_bound() <= summary.total / summary.capacity
+    for item, count, error in summary.most_common(8):
+        assert count - error <= true_counts[item] <= count
+    assert summary.most_common(1)[0][0] == "heavy"
+    with pytest.raises(ValueError):
+        SpaceSaving(0)
+
+def test_count_shingles_parallel_matches_serial():
+    """ Test that parallel counting gives the serial result for every segment size """
+    text = "a b c a b c  d a b c a b e a b c d "
+    for k in (1, 2, 3, 4):
+        expected = Counter(iter_shingles([text], k))
+        for segment_size in (1, 2, 3, 5, 100):
+            result = count_shingles_parallel(read_chunks(io.StringIO(text), 4), k, workers=2, segment_size=segment_size)
+            assert result == expected
+            assert result.most_common() == expected.most_common()
+    # tokens longer than a segment, and many segments merged in the workers
+    text = " ".join(["abcdefgh", "x", "abcdefgh", "yy"] * 20)
+    for k in (1, 3):
+        expected = Counter(iter_shingles([text], k))
+        result = count_shingles_parallel(read_chunks(io.StringIO(text), 3), k, workers=2, segment_size=4)
+        assert result.most_common() == expected.most_common()
+    # one chunk cut into many segments, and tokens holding the separator of the joined shingles
+    for text in (" ".join(f"w{i % 7}" for i in range(200)), "a\0 b c a\0 b d a\0 b"):
+        expected = Counter(iter_shingles([text], 2))
+        assert count_shingles_parallel([text], 2, workers=2, segment_size=16).most_common() == expected.most_common()
+    with pytest.raises(ValueError):
+        count_shingles_parallel(["a b"], 3, workers=1)
+    with pytest.raises(ValueError):
+        count_shingles_parallel([], 1, workers=1)
+    with pytest.raises(ValueError):
+        count_shingles_parallel(["a b"], 1, workers=1, segment_size=0)
+
 
 # Part C tests
 # Test preprocess_text function
 def test_preprocess_text_no_punctuation():
     text = "Hello, world! How are you?"
     assert preprocess_text(text, remove_punctuation=True) == "Hello world How are you"
+
 def test_preprocess_text_with_punctuation():
     text = "Hello, world! How are you?"
     assert preprocess_text(text, remove_punctuation=False) == text
@@ -91,6 +240,115 @@ def test_jaccard_similarity_invalid_input():
     with pytest.raises(TypeError):
         jaccard_similarity("hello", {"world"})
 
+# Test hashed shingles
+def test_hashed_shingles(monkeypatch):
+    text = "a b c a b c d e a b f g h a b c"
+    for k in (1, 2, 3):
+        hashes = hashed_shingles([text], k)
+        assert len(hashes) == len(set(shingles(text, k)))
+        assert all(hashes[:-1] < hashes[1:])
+        # block boundaries must not lose or invent k-grams
+        monkeypatch.setattr(a, "HASH_BLOCK_SIZE", 2)
+        assert list(hashed_shingles(read_chunks(io.StringIO(text), 3), k)) == list(hashes)
+        monkeypatch.undo()
+    with pytest.raises(ValueError):
+        hashed_shingles(["a b"], 3)
+    with pytest.raises(TypeError):
+        hashed_shingles(["a b"], "3")
+
+def test_jaccard_similarity_hashed():
+    text1 = "This is a test. This is only a test"
+    text2 = "This is a test of something else entirely"
+    for k in (1, 2, 3):
+        expected = jaccard_similarity(set(shingles(text1, k)), set(shingles(text2, k)))
+        assert jaccard_similarity_hashed(hashed_shingles([text1], k), hashed_shingles([text2], k)) == expected
+    with pytest.raises(TypeError):
+        jaccard_similarity_hashed({1}, {2})
+
+def test_compare_files_hashed(tmp_path):
+    file1, file2 = tmp_path / "file1.txt", tmp_path / "file2.txt"
+    file1.write_text("Hello, world! How are you? Fine, thanks.")
+    file2.write_text("Hello, world! How are they? Fine.")
+    for k in (1, 2):
+        for remove_punctuation in (True, False):
+            assert compare_files(str(file1), str(file2), k, remove_punctuation, hashed=True) == \
+                compare_files(str(file1), str(file2), k, remove_punctuation)
+
+def test_compare_files_mmap(tmp_path, monkeypatch):
+    monkeypatch.setattr(compare, "MMAP_WINDOW", 8)
+    file1, file2 = tmp_path / "file1.txt", tmp_path / "file2.txt"
+    file1.write_text("Hello, world! How are you? Fine, thanks. snake_case (words) here")
+    file2.write_text("Hello, world! How are they? Fine. snake_case words")
+    for k in (1, 2, 3):
+        for remove_punctuation in (True, False):
+            expected = compare_files(str(file1), str(file2), k, remove_punctuation)
+            assert compare_files(str(file1), str(file2), k, remove_punctuation, use_mmap=True) == expected
+            assert compare_files(str(file1), str(file2), k, remove_punctuation, hashed=True, use_mmap=True) == expected
+    # non-ASCII punctuation is removed too, also when a window cuts a character
+    file1.write_text("naïve «quoted» café — done… ok", encoding='utf-8')
+    file2.write_text("naïve quoted café done ok", encoding='utf-8')
+    for k in (1, 2):
+        for remove_punctuation in (True, False):
+            assert compare_files(str(file1), str(file2), k, remove_punctuation, use_mmap=True) == \
+                compare_files(str(file1), str(file2), k, remove_punctuation)
+    file2.write_text("")
+    with pytest.raises(ValueError):
+        compare_files(str(file1), str(file2), 2, True, use_mmap=True)
+
+def test_compare_files_multi_k(tmp_path, monkeypatch, capsys):
+    file1, file2 = tmp_path / "file1.txt", tmp_path / "file2.txt"
+    file1.write_text("Hello, world! How are you? Fine, thanks.")
+    file2.write_text("Hello, world! How are they? Fine.")
+    for hashed in (True, False):
+        for use_mmap in (True, False):
+            result = compare_files_multi_k(str(file1), str(file2), range(1, 4), True, hashed, use_mmap)
+            assert result == {k: compare_files(str(file1), str(file2), k, True) for k in range(1, 4)}
+    # invalid ranges and the cache are rejected with a usage error
+    for extra in (["--k-range", "5", "2"], ["--k-range", "0", "2"],
+                  ["--k-range", "1", "2", "--cache-dir", str(tmp_path / "cache")]):
+        monkeypatch.setattr("sys.argv", ["compare.py", "--query", str(file1), "--target", str(file2)] + extra)
+        with pytest.raises(SystemExit):
+            compare.main()
+        assert "--k-range" in capsys.readouterr().err
+
+def test_incremental_comparison(tmp_path):
+    log, reference, state = tmp_path / "log.txt", tmp_path / "reference.txt", tmp_path / "state.pkl"
+    reference.write_text("the quick brown fox jumps over the lazy dog")
+    log.write_text("")
+    comparison = IncrementalComparison(str(log), str(reference), 2)
+    with pytest.raises(ValueError):
+        comparison.update()
+    # appended pieces cut tokens and a multi-byte character in the middle
+    pieces = ["the qu".encode(), "ick brown fox ".encode(), "jumps ov".encode(), "er the lazy ca".encode(),
+              "t ".encode() + "é".encode()[:1], "é".encode()[1:] + " dog".encode()]
+    for piece in pieces:
+        with open(log, 'ab') as f:
+            f.write(piece)
+        comparison.save(str(state))
+        comparison = IncrementalComparison.load(str(state))
+        similarity = comparison.update()
+        if piece != pieces[4]:
+            assert similarity == compare_files(str(log), str(reference), 2, False)
+    assert comparison.offset == log.stat().st_size
+
+    # truncated file is read again from the start, a changed reference is recounted
+    log.write_text("the quick brown fox")
+    assert comparison.update() == compare_files(str(log), str(reference), 2, False)
+    reference.write_text("the quick brown fox")
+    assert comparison.update() == 1.0
+
+def test_compare_files_encoded(tmp_path):
+    file1, file2 = tmp_path / "file1.txt", tmp_path / "file2.txt"
+    file1.write_text("Hello, world! How are you? Fine, thanks.")
+    file2.write_text("Hello, world! How are they? Fine.")
+    for k in (1, 2, 3):
+        for remove_punctuation in (True, False):
+            assert compare_files(str(file1), str(file2), k, remove_punctuation, encoded=True) == \
+                compare_files(str(file1), str(file2), k, remove_punctuation)
+    file2.write_text("")
+    with pytest.raises(ValueError):
+        compare_files(str(file1), str(file2), 2, True, encoded=True)
+
 # Test compare_files function
 def test_compare_files():
     # The part of the code that was gerenated by Github Copilot for the prompt : write a tests for the function
@@ -122,6 +380,342 @@ def test_compare_files():
     with pytest.raises(ValueError):
         compare_files("file1.txt", "file2.txt", 3, False)
 
+# Part D tests for the MinHash LSH index
+def test_minhash_signature():
+    set1 = set(shingles("one two three four five six seven eight nine ten", 2))
+    assert len(minhash_signature(set1, num_perm=64)) == 64
+    assert estimate_jaccard(minhash_signature(set1), minhash_signature(set(set1))) == 1.0
+    set2 = set(shingles("eleven twelve thirteen fourteen fifteen sixteen", 2))
+    assert estimate_jaccard(minhash_signature(set1), minhash_signature(set2)) < 0.2
+
+def test_minhash_signature_invalid_input():
+    with pytest.raises(TypeError):
+        minhash_signature(["a b"])
+    with pytest.raises(ValueError):
+        minhash_signature(set())
+    with pytest.raises(ValueError):
+        minhash_signature({"a b"}, num_perm=0)
+    with pytest.raises(ValueError):
+        LSHIndex(2, num_perm=128, bands=30)
+
+def test_lsh_index(tmp_path):
+    words = [f"word{i}" for i in range(200)]
+    (tmp_path / "same.txt").write_text(" ".join(words))
+    (tmp_path / "near.txt").write_text(" ".join(words[:190] + ["other"] * 10))
+    (tmp_path / "other.txt").write_text(" ".join(f"token{i}" for i in range(200)))
+    (tmp_path / "empty.txt").write_text("")
+    query = tmp_path / "query.txt"
+    query.write_text(" ".join(words))
+    with pytest.warns(UserWarning):
+        index = build_index(str(tmp_path), 3, False)
+    index.save(str(tmp_path / "index.pkl"))
+    index = LSHIndex.load(str(tmp_path / "index.pkl"))
+
+    result = query_index(index, str(query), threshold=0.5, verify=True)
+    assert [path for path, _, _ in result] == [str(query), str(tmp_path / "same.txt"), str(tmp_path / "near.txt")]
+    assert result[0][2] == 1.0
+    assert result[2][2] == pytest.approx(compare_files(str(query), str(tmp_path / "near.txt"), 3, False))
+
+# Part E tests for the all-pairs mode
+def test_all_pairs_similarity(tmp_path):
+    texts = ["a b c d e f", "a b c d x y", "a b c d e f", "p q r s t u", "a"]
+    for i, text in enumerate(texts):
+        (tmp_path / f"doc{i}.txt").write_text(text)
+    with pytest.warns(UserWarning):
+        files, pairs = all_pairs_similarity(str(tmp_path), 2, False, min_sim=0.1, workers=2)
+    assert len(files) == 4
+    assert pairs == [(0, 1, pytest.approx(3 / 7)), (0, 2, 1.0), (1, 2, pytest.approx(3 / 7))]
+    with pytest.warns(UserWarning):
+        _, hashed_pairs = all_pairs_similarity(str(tmp_path), 2, False, min_sim=0.1, hashed=True, workers=2)
+    assert hashed_pairs == pairs
+
+    write_similarity_matrix(str(tmp_path / "matrix.csv"), files, pairs)
+    lines = (tmp_path / "matrix.csv").read_text().splitlines()
+    assert lines[0] == "file1,file2,similarity"
+    assert lines[2] == f"{files[0]},{files[2]},1.000000"
+    with pytest.raises(ValueError):
+        all_pairs_similarity(str(tmp_path), 2, False, min_sim=2)
+
+# Part F tests for the shingle cache
+def test_shingle_cache_hit_and_invalidation(tmp_path):
+    cache = ShingleCache(str(tmp_path / "cache"))
+    file1, file2 = tmp_path / "file1.txt", tmp_path / "file2.txt"
+    file1.write_text("one two three four")
+    file2.write_text("one two three five")
+    assert cache.get(str(file1), 2, False) is None
+    assert compare_files(str(file1), str(file2), 2, False, cache=cache) == 0.5
+    assert cache.get(str(file1), 2, False) == {"one two", "two three", "three four"}
+    assert cache.get(str(file1), 3, False) is None
+    assert compare_files(str(file1), str(file2), 2, False, hashed=True, cache=cache) == 0.5
+    assert len(cache.get(str(file1), 2, False, hashed=True)) == 3
+
+    # a changed file must not be served from the cache
+    file1.write_text("one two three five six")
+    assert cache.get(str(file1), 2, False) is None
+    assert compare_files(str(file1), str(file2), 2, False, cache=cache) == 0.75
+
+def test_shingle_cache_eviction(tmp_path):
+    cache = ShingleCache(str(tmp_path / "cache"), max_bytes=1)
+    file1 = tmp_path / "file1.txt"
+    file1.write_text("one two three four")
+    cache.put(str(file1), 2, False, {"one two"})
+    assert cache.size() == 0
+    cache.max_bytes = 10 ** 6
+    cache.put(str(file1), 2, False, {"one two"})
+    cache.put(str(file1), 3, False, {"one two three"})
+    entries = sorted(os.listdir(tmp_path / "cache" / "entries"))
+    assert len(entries) == 2
+    # reading the k=2 entry makes the k=3 entry the least recently used one
+    os.utime(tmp_path / "cache" / "entries" / entries[0], ns=(1, 1))
+    os.utime(tmp_path / "cache" / "entries" / entries[1], ns=(2, 2))
+    cache.get(str(file1), 2, False)
+    cache.max_bytes = cache.size() - 1
+    cache.evict()
+    assert cache.get(str(file1), 2, False) == {"one two"}
+    assert cache.get(str(file1), 3, False) is None
+    with pytest.raises(ValueError):
+        ShingleCache(str(tmp_path / "cache"), max_bytes=0)
+
+# Part G tests for the benchmarks
+def test_generate_corpus():
+    documents = generate_corpus(3, 1000, 50, 1.0, seed=1)
+    assert len(documents) == 3
+    assert documents[0] == documents[1] == documents[2]
+    assert len(documents[0].split(' ')) == 1000
+    assert generate_corpus(2, 100, 50, 0.0, seed=1) == generate_corpus(2, 100, 50, 0.0, seed=1)
+    with pytest.raises(ValueError):
+        generate_corpus(2, 100, 50, 1.5)
+
+def test_run_benchmark_and_compare():
+    results = run_benchmark(generate_corpus(2, 500, 50), k=2, repeat=1)
+    assert set(results) >= {"preprocess_text", "shingles", "counter_shingles", "jaccard_similarity"}
+    assert all(result["tokens_per_s"] > 0 and result["peak_bytes"] > 0 for result in results.values())
+    slower = {stage: dict(result, tokens_per_s=result["tokens_per_s"] / 2) for stage, result in results.items()}
+    assert compare_results(results, results) == []
+    assert len(compare_results(results, slower)) == len(results)
+    with pytest.raises(ValueError):
+        run_benchmark(["one document"])
+    result = run_parallel_benchmark(generate_corpus(1, 2000, 50)[0], k=2, workers=2)
+    assert 0 < result["distinct"] <= 2500
+    assert min(result["serial_s"], result["parallel_s"], result["parent_cpu_s"]) >= 0
+
+# Part H tests for the query server
+def test_reference_store(tmp_path):
+    target = tmp_path / "target.txt"
+    target.write_text("Hello, world! How are you?")
+    store = ReferenceStore()
+    assert compare_text(store, "Hello, world! How are they?", str(target), 2, True) == 0.6
+    assert compare_text(store, "Hello, world! How are they?", str(target), 2, True, hashed=True) == 0.6
+    assert len(store) == 2
+    target.write_text("Hello, world! How are they now?")
+    assert compare_text(store, "Hello, world! How are they?", str(target), 2, True) == 0.8
+    with pytest.raises(ValueError):
+        compare_text(store, "", str(target), 2)
+    with pytest.raises(TypeError):
+        compare_text(store, None, str(target), 2)
+    # the least recently used document is dropped first
+    store = ReferenceStore(max_documents=2)
+    paths = []
+    for name in ("a", "b", "c"):
+        paths.append(tmp_path / f"{name}.txt")
+        paths[-1].write_text(f"{name} one two")
+    store.get(str(paths[0]), 2, False)
+    store.get(str(paths[1]), 2, False)
+    store.get(str(paths[0]), 2, False)
+    store.get(str(paths[2]), 2, False)
+    assert len(store) == 2
+    assert [key[0] for key in store._documents] == [str(paths[0]), str(paths[2])]
+    with pytest.raises(ValueError):
+        ReferenceStore(max_documents=0)
+
+def test_server_batch(tmp_path):
+    target = tmp_path / "target.txt"
+    target.write_text("one two three four")
+    socket_path = str(tmp_path / "server.sock")
+    queries = [{"text": "one two three four", "target": str(target), "k": 2},
+               {"text": "one two five", "target": str(target), "k": 2, "hashed": True},
+               {"text": "one", "target": str(target), "k": 2},
+               {"text": "one two", "target": str(tmp_path / "missing.txt"), "k": 2}]
+
+    async def scenario():
+        server = await start_server(socket_path, ReferenceStore())
+        async with server:
+            results = await asyncio.get_running_loop().run_in_executor(None, send_queries, socket_path, queries)
+            with pytest.raises(ValueError):
+                await asyncio.get_running_loop().run_in_executor(None, send_queries, socket_path, "bad")
+        return results
+
+    results = asyncio.run(scenario())
+    assert results[0] == {"similarity": 1.0}
+    assert results[1] == {"similarity": 0.25}
+    assert "ValueError" in results[2]["error"]
+    assert "FileNotFoundError" in results[3]["error"]
+
+
+def test_server_slow_request_does_not_block(tmp_path, monkeypatch):
+    target = tmp_path / "target.txt"
+    target.write_text("one two three four")
+    socket_path = str(tmp_path / "server.sock")
+    original = server.compare_text
+
+    def slow_compare_text(store, text, *args, **kwargs):
+        if text == "slow":
+            time.sleep(1.0)
+            text = "one two"
+        return original(store, text, *args, **kwargs)
+
+    monkeypatch.setattr(server, "compare_text", slow_compare_text)
+
+    def clients():
+        # both clients run in threads, the event loop only serves
+        done = {}
+
+        def query(name, text):
+            done[name] = send_queries(socket_path, [{"text": text, "target": str(target), "k": 2}])
+            done[name + "_time"] = time.perf_counter()
+
+        slow = threading.Thread(target=query, args=("slow", "slow"))
+        slow.start()
+        time.sleep(0.2)
+        query("fast", "one two three")
+        slow.join()
+        return done
+
+    async def scenario():
+        async with await start_server(socket_path, ReferenceStore()):
+            return await asyncio.get_running_loop().run_in_executor(None, clients)
+
+    done = asyncio.run(scenario())
+    assert done["fast_time"] < done["slow_time"]
+    assert done["fast"] == [{"similarity": 2 / 3}] and done["slow"] == [{"similarity": 1 / 3}]
+
+# Part I tests for SimHash
+def test_simhash():
+    words = [f"word{i}" for i in range(300)]
+    set1 = set(shingles(" ".join(words), 3))
+    set2 = set(shingles(" ".join(words[:290] + ["other"] * 10), 3))
+    set3 = set(shingles(" ".join(f"token{i}" for i in range(300)), 3))
+    assert simhash(set1) == simhash(set(set1))
+    assert 0 <= simhash(set1) < 1 << 64
+    assert hamming_distance(simhash(set1), simhash(set2)) < hamming_distance(simhash(set1), simhash(set3))
+    assert simhash(counter_shingles(["a b", "a b", "b c"])) == simhash({"a b": 2, "b c": 1})
+    assert hamming_distance(0b1011, 0b0010) == 2
+    with pytest.raises(TypeError):
+        simhash(["a b"])
+    with pytest.raises(ValueError):
+        simhash(set())
+    with pytest.raises(ValueError):
+        SimHashIndex(3, max_distance=64)
+
+def test_simhash_index(tmp_path):
+    index = SimHashIndex(3, max_distance=3)
+    index.add("a", 0)
+    index.add("b", 0b111)
+    index.add("c", 0b1111)
+    index.add("d", (1 << 64) - 1)
+    assert index.query(0) == [("a", 0), ("b", 3)]
+    assert index.query(0, 2) == [("a", 0)]
+    with pytest.raises(ValueError):
+        index.add("a", 1)
+    with pytest.raises(ValueError):
+        index.query(0, 4)
+
+    words = [f"word{i}" for i in range(300)]
+    (tmp_path / "same.txt").write_text(" ".join(words))
+    (tmp_path / "other.txt").write_text(" ".join(f"token{i}" for i in range(300)))
+    (tmp_path / "empty.txt").write_text("")
+    query = tmp_path / "query.txt"
+    query.write_text(" ".join(words))
+    with pytest.warns(UserWarning):
+        index = build_simhash_index(str(tmp_path), 3, False, weighted=True, max_distance=4)
+    index.save(str(tmp_path / "index.pkl"))
+    index = SimHashIndex.load(str(tmp_path / "index.pkl"))
+    assert query_simhash_index(index, str(query), 0) == [(str(query), 0), (str(tmp_path / "same.txt"), 0)]
+
+# Part J tests for HyperLogLog
+def test_hyperloglog():
+    rng = np.random.default_rng(0)
+    hashes = rng.integers(0, 1 << 63, size=200000, dtype=np.uint64)
+    sketch1, sketch2 = HyperLogLog(12), HyperLogLog(12)
+    sketch1.update(hashes[:150000])
+    sketch1.update(hashes[:1000])
+    sketch2.update(hashes[50000:])
+    assert sketch1.nbytes == 4096
+    assert sketch1.count() == pytest.approx(150000, rel=0.05)
+    assert sketch1.union(sketch2).count() == pytest.approx(200000, rel=0.05)
+    assert estimate_jaccard_hll(sketch1, sketch2) == pytest.approx(0.5, abs=0.05)
+    sketch1.merge(sketch2)
+    assert sketch1.count() == sketch1.union(sketch2).count()
+    with pytest.raises(ValueError):
+        HyperLogLog(3)
+    with pytest.raises(ValueError):
+        sketch1.merge(HyperLogLog(10))
+    with pytest.raises(ValueError):
+        estimate_jaccard_hll(HyperLogLog(), HyperLogLog())
+    with pytest.raises(TypeError):
+        sketch1.update([1, 2])
+
+def test_compare_files_hll(tmp_path):
+    words = [f"word{i}" for i in range(3000)]
+    (tmp_path / "a.txt").write_text(" ".join(words))
+    (tmp_path / "b.txt").write_text(" ".join(words[:2000] + [f"other{i}" for i in range(1000)]))
+    exact = compare_files(str(tmp_path / "a.txt"), str(tmp_path / "b.txt"), 3, False)
+    assert compare_files_hll(str(tmp_path / "a.txt"), str(tmp_path / "b.txt"), 3, False) == pytest.approx(exact, abs=0.03)
+    text = " ".join(words) * 30
+    blocks = list(iter_hashed_shingle_blocks([text], [2, 3]))
+    assert len(blocks) > 1
+    assert np.array_equal(np.unique(np.concatenate([block[3] for block in blocks])), hashed_shingles([text], 3))
+    # the last block has no shingle when the text ends right after a full block
+    for k in (1, 3):
+        n_words = a.HASH_BLOCK_SIZE + k - 1
+        boundary = tmp_path / f"boundary{k}.txt"
+        boundary.write_text(" ".join(f"w{i}" for i in range(n_words)))
+        blocks = list(iter_hashed_shingle_blocks([boundary.read_text()], [k]))
+        assert len(blocks[-1][k]) == 0
+        assert sum(len(block[k]) for block in blocks) == n_words - k + 1
+        assert file_hyperloglog(str(boundary), k, False).count() == pytest.approx(n_words - k + 1, rel=0.05)
+
+# Part K tests for one query against many targets
+def test_compare_query_to_targets(tmp_path):
+    words = [f"word{i}" for i in range(100)]
+    query = tmp_path / "query.txt"
+    query.write_text(" ".join(words))
+    (tmp_path / "t1.txt").write_text(" ".join(words))
+    (tmp_path / "t2.txt").write_text(" ".join(words[:50] + [f"other{i}" for i in range(50)]))
+    (tmp_path / "t3.txt").write_text(" ".join(f"other{i}" for i in range(100)))
+    (tmp_path / "short.txt").write_text("word0")
+    targets = expand_targets([str(tmp_path / "t*.txt"), str(tmp_path / "t1.txt"), str(tmp_path / "short.txt")])
+    assert targets == [str(tmp_path / name) for name in ("t1.txt", "t2.txt", "t3.txt", "short.txt")]
+    with pytest.raises(ValueError):
+        expand_targets([str(tmp_path / "*.csv")])
+    # an existing path is used as is, not as a pattern matching notes1.txt
+    (tmp_path / "notes[1].txt").write_text("word0")
+    (tmp_path / "notes1.txt").write_text("word0")
+    assert expand_targets([str(tmp_path / "notes[1].txt")]) == [str(tmp_path / "notes[1].txt")]
+
+    for hashed in (False, True):
+        with pytest.warns(UserWarning):
+            result = compare_query_to_targets(str(query), targets, 3, False, hashed, workers=2)
+        assert [path for path, _ in result] == targets[:3]
+        assert result[1][1] == pytest.approx(compare_files(str(query), targets[1], 3, False))
+    with pytest.warns(UserWarning):
+        assert compare_query_to_targets(str(query), targets, 3, False, top=1, workers=2) == [(targets[0], 1.0)]
+
+
+def test_main_single_bracketed_target(tmp_path, monkeypatch, capsys):
+    query = tmp_path / "y.txt"
+    query.write_text("one two three four")
+    target = tmp_path / "x[1].txt"
+    target.write_text("one two three four")
+    (tmp_path / "x1.txt").write_text("five six seven eight")
+    monkeypatch.setattr("sys.argv", ["compare.py", "--query", str(query), "--target", str(target), "-k", "2",
+                                     "--simhash"])
+    compare.main()
+    assert "Hamming distance: 0" in capsys.readouterr().out
+    monkeypatch.setattr("sys.argv", ["compare.py", "--query", str(query), "--target", str(target), "-k", "2"])
+    compare.main()
+    assert capsys.readouterr().out == "Jaccard similarity: 1.0000\n"
+
 
 if __name__ == "__main__":
     # Task a tests
@@ -130,14 +724,52 @@ if __name__ == "__main__":
     test_shingles_with_zero_k()
     test_empty_string_shingles()
     test_shingles_with_valid_input()
+    test_iter_shingles_matches_shingles()
+    test_iter_shingles_invalid_input()
+    test_strip_chunks()
     # Task B tests
     test_counter_shingles_with_valid_input()
     test_counter_shingles_with_invalid_input()
+    test_counter_shingles_with_encoded_input()
+    test_encoded_shingles()
+    test_space_saving_exact_when_under_capacity()
+    test_space_saving_error_bounds()
+    test_count_shingles_parallel_matches_serial()
 
     # Task C tests
     test_preprocess_text_no_punctuation()
     test_preprocess_text_with_punctuation()
     test_jaccard_similarity()
     test_jaccard_similarity_invalid_input()
+    test_jaccard_similarity_hashed()
     test_compare_files()
+
+    # Task D tests
+    test_minhash_signature()
+    test_minhash_signature_invalid_input()
+
+    # SimHash tests
+    test_simhash()
+    test_hyperloglog()
+
+    # Benchmarks
+    test_generate_corpus()
+    test_run_benchmark_and_compare()
+
+    # Tests of files, the servers and the indexes
+    for test in (test_compare_files_hashed, test_incremental_comparison, test_compare_files_encoded, test_lsh_index,
+                 test_all_pairs_similarity, test_shingle_cache_hit_and_invalidation, test_shingle_cache_eviction,
+                 test_reference_store, test_server_batch, test_simhash_index, test_compare_files_hll,
+                 test_compare_query_to_targets):
+        with tempfile.TemporaryDirectory() as directory:
+            test(pathlib.Path(directory))
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_multi_k_shingles(monkeypatch)
+    with pytest.MonkeyPatch.context() as monkeypatch:
+        test_hashed_shingles(monkeypatch)
+    for test in (test_compare_files_mmap, test_server_slow_request_does_not_block):
+        with tempfile.TemporaryDirectory() as directory, pytest.MonkeyPatch.context() as monkeypatch:
+            test(pathlib.Path(directory), monkeypatch)
+    # test_compare_files_multi_k and test_main_single_bracketed_target read the output with capsys,
+    # they only run under pytest
     print("All tests passed")
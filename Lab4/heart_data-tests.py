@@ -0,0 +1,66 @@
+import pathlib
+import tempfile
+import warnings
+
+import numpy as np
+import pandas as pd
+from heart_data import load_heart_data, parse_heart_csv
+
+
+def test_load_heart_data_dtypes_and_cache(tmp_path):
+    csv_path = tmp_path / "heart.csv"
+    csv_path.write_text(",Age,Sex,Disease,Oldpeak\n0,63,male,True,2.3\n1,41,female,False,0.5\n2,57,male,False,1.0\n")
+    cache_dir = str(tmp_path / "cache")
+    data = load_heart_data(str(csv_path), cache_dir)
+    assert data["Age"].dtype == np.int8
+    assert data["Disease"].dtype == bool
+    assert isinstance(data["Sex"].dtype, pd.CategoricalDtype)
+    assert data["Oldpeak"].dtype == np.float64
+    # cache hit returns the same frame
+    pd.testing.assert_frame_equal(load_heart_data(str(csv_path), cache_dir), data)
+    pd.testing.assert_frame_equal(load_heart_data(str(csv_path), use_cache=False), data)
+
+
+def test_load_heart_data_cache_invalidated(tmp_path):
+    csv_path = tmp_path / "heart.csv"
+    csv_path.write_text(",Age,Sex\n0,63,male\n")
+    cache_dir = str(tmp_path / "cache")
+    load_heart_data(str(csv_path), cache_dir)
+    csv_path.write_text(",Age,Sex\n0,63,male\n1,300,female\n")
+    data = load_heart_data(str(csv_path), cache_dir)
+    assert len(data) == 2
+    assert data["Age"].dtype == np.int16
+    assert list(data["Sex"]) == ["male", "female"]
+
+
+def test_load_heart_data_high_cardinality_text(tmp_path):
+    # more distinct values than MAX_CATEGORIES, the column stays text, with one missing value
+    csv_path = tmp_path / "heart.csv"
+    rows = "".join(f"{i},patient{i},male\n" for i in range(300))
+    csv_path.write_text(",Name,Sex\n" + rows + "300,,female\n")
+    cache_dir = str(tmp_path / "cache")
+    with warnings.catch_warnings():
+        warnings.simplefilter("error")
+        first = load_heart_data(str(csv_path), cache_dir)
+        cached = load_heart_data(str(csv_path), cache_dir)
+    pd.testing.assert_frame_equal(cached, parse_heart_csv(str(csv_path)))
+    pd.testing.assert_frame_equal(cached, first)
+    assert pd.isna(cached["Name"].iloc[-1])
+
+
+def test_load_heart_data_damaged_cache_rebuilt(tmp_path):
+    csv_path = tmp_path / "heart.csv"
+    csv_path.write_text(",Age,Sex\n0,63,male\n1,41,female\n")
+    cache_dir = tmp_path / "cache"
+    data = load_heart_data(str(csv_path), str(cache_dir))
+    (cache_dir / "columns.bin").write_bytes(b"\0")
+    pd.testing.assert_frame_equal(load_heart_data(str(csv_path), str(cache_dir)), data)
+    pd.testing.assert_frame_equal(load_heart_data(str(csv_path), str(cache_dir)), data)
+
+
+if __name__ == "__main__":
+    for test in (test_load_heart_data_dtypes_and_cache, test_load_heart_data_cache_invalidated,
+                 test_load_heart_data_high_cardinality_text, test_load_heart_data_damaged_cache_rebuilt):
+        with tempfile.TemporaryDirectory() as directory:
+            test(pathlib.Path(directory))
+    print("All tests passed!")
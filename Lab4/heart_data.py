@@ -0,0 +1,229 @@
+'''Lab 4 typed loader of the heart disease dataset
+Descriptions of the functions:
+    parse_heart_csv - parses the CSV into compact dtypes (categorical text, bool, smallest integers)
+    load_heart_data - the parsed dataset, from a binary columnar cache while the CSV is unchanged
+    compare_load_paths - load time and memory of the raw pd.read_csv against the cached loader
+'''
+import argparse
+import json
+import os
+import shutil
+import tempfile
+import time
+import warnings
+
+import numpy as np
+import pandas as pd
+
+DEFAULT_CSV = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'heart_disease_dataset.csv')
+# Text columns are categorical, the other text columns only when they have few distinct values
+CATEGORICAL_COLUMNS = ("Sex",)
+MAX_CATEGORIES = 256
+# Bumped when the layout of the cache changes, older caches are rebuilt
+CACHE_VERSION = 2
+_MANIFEST = 'manifest.json'
+_COLUMNS = 'columns.bin'
+
+
+def parse_heart_csv(csv_path: str = DEFAULT_CSV) -> pd.DataFrame:
+    """
+    Parses the heart disease CSV into compact dtypes.
+
+    The unnamed first column becomes the index. Integer columns get the smallest integer dtype holding
+    their values (int8 or int16 for this dataset), True/False columns are bool, Sex and other text
+    columns with few distinct values are categorical. Float columns keep float64 to stay exact.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+
+    Returns:
+        pd.DataFrame: The dataset.
+    """
+    data = pd.read_csv(csv_path, index_col=0)
+    for column in data.columns:
+        series = data[column]
+        if pd.api.types.is_bool_dtype(series):
+            continue
+        if pd.api.types.is_integer_dtype(series):
+            data[column] = pd.to_numeric(series, downcast='integer')
+        elif column in CATEGORICAL_COLUMNS or (not pd.api.types.is_numeric_dtype(series)
+                                               and series.nunique() <= MAX_CATEGORIES):
+            data[column] = series.astype('category')
+    data.index = pd.to_numeric(data.index, downcast='integer')
+    return data
+
+
+def _source_version(csv_path: str) -> dict:
+    stat = os.stat(csv_path)
+    return {"path": os.path.abspath(csv_path), "mtime_ns": stat.st_mtime_ns, "size": stat.st_size,
+            "version": CACHE_VERSION}
+
+
+def _default_cache_dir(csv_path: str) -> str:
+    directory, name = os.path.split(os.path.abspath(csv_path))
+    return os.path.join(directory, '.columnar_cache', os.path.splitext(name)[0])
+
+
+def _encode(values: np.ndarray, dtype) -> tuple:
+    """(manifest entry, array) of a column, text (object) columns are stored as codes into their distinct values."""
+    if not values.dtype.hasobject:
+        return {}, values
+    codes, uniques = pd.factorize(values)
+    # missing values get the code -1, the last element of the values when reading
+    return {"values": uniques.tolist(), "pandas_dtype": str(dtype)}, codes.astype(np.int32)
+
+
+def _decode(entry: dict, values: np.ndarray):
+    if "categories" in entry:
+        return pd.Categorical.from_codes(values, entry["categories"])
+    if "values" in entry:
+        return pd.array(np.array(entry["values"] + [None], dtype=object)[values], dtype=entry["pandas_dtype"])
+    return values
+
+
+def _column_arrays(data: pd.DataFrame) -> list:
+    """(manifest entry, array) of the index and every column, categorical columns are stored as their codes."""
+    entry, values = _encode(data.index.to_numpy(), data.index.dtype)
+    arrays = [({"name": data.index.name, "index": True, **entry}, values)]
+    for column in data.columns:
+        series = data[column]
+        if isinstance(series.dtype, pd.CategoricalDtype):
+            entry, values = {"categories": series.cat.categories.tolist()}, series.cat.codes.to_numpy()
+        else:
+            entry, values = _encode(series.to_numpy(), series.dtype)
+        arrays.append(({"name": column, **entry}, values))
+    return arrays
+
+
+def _write_cache(data: pd.DataFrame, cache_dir: str, source: dict):
+    """Writes the columns one after the other into a single binary file, and the manifest last.
+
+    A partial cache has no manifest, so it is never read.
+    """
+    parent = os.path.dirname(os.path.abspath(cache_dir))
+    os.makedirs(parent, exist_ok=True)
+    tmp_dir = tempfile.mkdtemp(dir=parent)
+    try:
+        columns = []
+        offset = 0
+        with open(os.path.join(tmp_dir, _COLUMNS), 'wb') as f:
+            for entry, values in _column_arrays(data):
+                values = np.ascontiguousarray(values)
+                entry.update({"dtype": values.dtype.str, "offset": offset, "length": len(values)})
+                f.write(values.tobytes())
+                # every column starts on an 8-byte boundary
+                padding = -values.nbytes % 8
+                f.write(b'\0' * padding)
+                offset += values.nbytes + padding
+                columns.append(entry)
+        with open(os.path.join(tmp_dir, _MANIFEST), 'w') as f:
+            json.dump({"source": source, "columns": columns}, f)
+        if os.path.exists(cache_dir):
+            shutil.rmtree(cache_dir)
+        os.replace(tmp_dir, cache_dir)
+    except BaseException:
+        shutil.rmtree(tmp_dir, ignore_errors=True)
+        raise
+
+
+def _read_cache(cache_dir: str, source: dict):
+    """The cached dataset, or None if there is no cache or it was built from another version of the CSV."""
+    try:
+        with open(os.path.join(cache_dir, _MANIFEST)) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get("source") != source:
+        return None
+    path = os.path.join(cache_dir, _COLUMNS)
+    try:
+        # one read of the whole file, the columns are views of the (writable) buffer
+        buffer = bytearray(os.path.getsize(path))
+        with open(path, 'rb') as f:
+            f.readinto(buffer)
+        index = None
+        columns = {}
+        for entry in manifest["columns"]:
+            values = _decode(entry, np.frombuffer(buffer, dtype=np.dtype(entry["dtype"]), count=entry["length"],
+                                                  offset=entry["offset"]))
+            if entry.get("index"):
+                index = pd.Index(values, name=entry["name"], copy=False)
+            else:
+                columns[entry["name"]] = values
+        return pd.DataFrame(columns, index=index, copy=False)
+    except (OSError, KeyError, TypeError, ValueError):
+        # a damaged or unreadable cache is rebuilt
+        return None
+
+
+def load_heart_data(csv_path: str = DEFAULT_CSV, cache_dir: str = None, use_cache: bool = True) -> pd.DataFrame:
+    """
+    Loads the heart disease dataset with compact dtypes (see parse_heart_csv).
+
+    The parsed columns are cached in a binary columnar file. The cache is used while the CSV keeps the same
+    path, modification time and size, and is rebuilt otherwise.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+        cache_dir (str): Directory of the cache, defaults to .columnar_cache next to the CSV.
+        use_cache (bool): Whether to read and write the cache.
+
+    Returns:
+        pd.DataFrame: The dataset.
+    Raises:
+        OSError: If the CSV file cannot be read.
+    """
+    if not use_cache:
+        return parse_heart_csv(csv_path)
+    if cache_dir is None:
+        cache_dir = _default_cache_dir(csv_path)
+    source = _source_version(csv_path)
+    data = _read_cache(cache_dir, source)
+    if data is None:
+        data = parse_heart_csv(csv_path)
+        try:
+            _write_cache(data, cache_dir, source)
+        except (OSError, TypeError, ValueError) as e:
+            warnings.warn(f"Could not write the cache of {csv_path}: {e}")
+    return data
+
+
+def compare_load_paths(csv_path: str = DEFAULT_CSV, cache_dir: str = None, repeat: int = 5) -> dict:
+    """
+    Measures the load time and memory of pd.read_csv on the raw CSV against load_heart_data.
+
+    Args:
+        csv_path (str): Path to the CSV file.
+        cache_dir (str): Directory of the cache, see load_heart_data.
+        repeat (int): Number of timed loads, the best one is reported.
+
+    Returns:
+        dict: "raw" and "cached", each with "seconds" and "bytes" (deep memory usage of the DataFrame).
+    """
+    load_heart_data(csv_path, cache_dir)
+    result = {}
+    for name, load in (("raw", lambda: pd.read_csv(csv_path)), ("cached", lambda: load_heart_data(csv_path, cache_dir))):
+        best = float('inf')
+        for _ in range(repeat):
+            start = time.perf_counter()
+            data = load()
+            best = min(best, time.perf_counter() - start)
+        result[name] = {"seconds": best, "bytes": int(data.memory_usage(deep=True).sum())}
+    return result
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Load the heart disease dataset through the typed columnar cache.")
+    parser.add_argument("--csv", type=str, default=DEFAULT_CSV, help="Path to the CSV file.")
+    parser.add_argument("--cache-dir", type=str, default=None, help="Directory of the columnar cache.")
+    parser.add_argument("--repeat", type=int, default=5, help="Number of timed loads.")
+    args = parser.parse_args()
+
+    print(load_heart_data(args.csv, args.cache_dir).dtypes.to_string())
+    report = compare_load_paths(args.csv, args.cache_dir, args.repeat)
+    for name, measures in report.items():
+        print(f"{name:>6}: {measures['seconds'] * 1000:8.2f} ms, {measures['bytes'] / 1024:8.1f} KB")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,7 +1,10 @@
 import pytest
 import numpy as np
-from scipy.stats import norm
-from height_analysis import generate_height_data, descriptive_statistics, visualise_histogram, calculate_percentiles, identify_outliers, random_sampling, hypothesis_testing, calculate_probability
+from scipy.stats import norm, ttest_1samp
+from height_analysis import generate_height_data, descriptive_statistics, visualise_histogram, calculate_percentiles, identify_outliers, random_sampling, hypothesis_testing, calculate_probability, summarize, \
+    HeightAccumulator, QuantileSketch, read_height_chunks, accumulate_files, hypothesis_testing_batch, \
+    bootstrap_distribution, bootstrap_confidence_intervals, HeightHistogram, \
+    grouped_summary, HeightDistribution
 # Test Cases for Task 1
 def test_generate_height_valid_input():
     """Test for generate_height_data function with valid input."""
@@ -33,6 +36,30 @@ def test_generate_height_invalid_input():
     with pytest.warns(UserWarning):
         generate_height_data(size=299)
 
+def test_generate_height_data_file(tmp_path, monkeypatch):
+    """Test that the file mode gives the same heights for any number of workers, and in memory."""
+    import height_analysis
+    monkeypatch.setattr(height_analysis, "GENERATE_CHUNK_SIZE", 1000)
+    one = generate_height_data(5500, path=str(tmp_path / "one.npy"), seed=3)
+    two = generate_height_data(5500, path=str(tmp_path / "two.npy"), seed=3, workers=2)
+    assert isinstance(one, np.memmap) and len(one) == 5500
+    assert (tmp_path / "one.npy").read_bytes() == (tmp_path / "two.npy").read_bytes()
+    assert np.array_equal(one, generate_height_data(5500, seed=3))
+    assert not np.array_equal(one, generate_height_data(5500, seed=4))
+
+def test_analysis_of_memmap(tmp_path, monkeypatch):
+    """Test that the analysis functions give the same results for a memmap, including the blocked quantiles."""
+    import height_analysis
+    monkeypatch.setattr(height_analysis, "SELECT_GATHER_LIMIT", 10)
+    height_data = np.round(np.random.default_rng(0).normal(170, 10, 20001), 1)
+    np.save(tmp_path / "heights.npy", height_data)
+    mapped = np.load(tmp_path / "heights.npy", mmap_mode='r')
+    assert np.allclose(calculate_percentiles(mapped), calculate_percentiles(height_data))
+    assert np.allclose(descriptive_statistics(mapped), descriptive_statistics(height_data))
+    assert np.array_equal(identify_outliers(mapped), identify_outliers(height_data))
+    assert np.allclose(hypothesis_testing(mapped, 170)[:2], hypothesis_testing(height_data, 170)[:2])
+    assert np.isclose(calculate_probability(mapped), calculate_probability(height_data))
+
 # Test Cases for Task 2
 
 def test_descriptive_statistics_valid_input():
@@ -70,6 +97,39 @@ def test_visualise_histogram_empty_array():
     with pytest.raises(ValueError):
         visualise_histogram(np.array([]))
 
+def test_height_histogram_merge_and_render(tmp_path):
+    """Test that merged histograms of shards match np.histogram and render to PNG headless."""
+    height_data = np.random.default_rng(0).normal(170, 10, 10000)
+    whole = HeightHistogram.from_data(height_data)
+    counts, edges = np.histogram(height_data, bins=30)
+    assert np.array_equal(whole.counts, counts) and np.allclose(whole.edges, edges)
+    merged = HeightHistogram(whole.edges[0], whole.edges[-1], 30)
+    for shard in np.array_split(height_data, 3):
+        part = HeightHistogram(whole.edges[0], whole.edges[-1], 30)
+        part.update(shard)
+        merged.merge(part)
+    assert np.array_equal(merged.counts, whole.counts)
+    merged.update(np.array([0.0, 500.0]))
+    assert (merged.underflow, merged.overflow) == (1, 1)
+    with pytest.raises(ValueError):
+        merged.merge(HeightHistogram(100, 200, 30))
+    visualise_histogram(height_data, path=str(tmp_path / "histogram.png"))
+    assert (tmp_path / "histogram.png").read_bytes()[:8] == b"\x89PNG\r\n\x1a\n"
+
+def test_height_histogram_values_on_edges():
+    """Test that values on (and one ulp around) the bin edges fall in the same bins as with np.histogram."""
+    histogram = HeightHistogram(150.1, 190.3, 7)
+    edges = histogram.edges
+    height_data = np.concatenate([edges, np.nextafter(edges, -np.inf), np.nextafter(edges, np.inf)])
+    histogram.update(height_data)
+    assert np.array_equal(histogram.counts, np.histogram(height_data, bins=edges)[0])
+    assert (histogram.underflow, histogram.overflow) == (1, 1)
+    rng = np.random.default_rng(1)
+    for _ in range(50):
+        height_data = np.round(rng.normal(170, 10, 500), 1)
+        histogram = HeightHistogram.from_data(height_data, bins=int(rng.integers(3, 40)))
+        assert np.array_equal(histogram.counts, np.histogram(height_data, bins=histogram.edges)[0])
+
 # Test Cases for Task 4
 
 def test_calculate_percentiles_valid_input():
@@ -148,6 +208,38 @@ def test_random_sampling_unique():
     sample = random_sampling(array)
     assert len(np.unique(sample)) == 50
 
+def test_random_sampling_generator():
+    array = np.arange(1000)
+    sample = random_sampling(array, 20, np.random.default_rng(0))
+    assert len(np.unique(sample)) == 20
+    assert np.array_equal(sample, random_sampling(array, 20, np.random.default_rng(0)))
+
+# Test Cases for the bootstrap
+def test_bootstrap_deterministic():
+    """Test that the bootstrap only depends on the seed, not on the number of workers."""
+    height_data = np.random.default_rng(0).normal(170, 10, 500)
+    distribution = bootstrap_distribution(height_data, ("mean", "median", "p25", "std"), 300, seed=7)
+    assert distribution.shape == (4, 300)
+    assert np.array_equal(distribution, bootstrap_distribution(height_data, ("mean", "median", "p25", "std"), 300,
+                                                               seed=7, workers=2))
+    assert not np.array_equal(distribution, bootstrap_distribution(height_data, ("mean", "median", "p25", "std"),
+                                                                   300, seed=8))
+
+def test_bootstrap_confidence_intervals():
+    height_data = np.random.default_rng(1).normal(170, 10, 2000)
+    intervals = bootstrap_confidence_intervals(height_data, ("mean", "p75"), 1000, seed=0)
+    estimate, low, high = intervals["mean"]
+    assert estimate == pytest.approx(np.mean(height_data))
+    assert low < estimate < high
+    assert high - low == pytest.approx(2 * 1.96 * np.std(height_data) / np.sqrt(2000), rel=0.15)
+    assert intervals["p75"][0] == pytest.approx(np.percentile(height_data, 75))
+    with pytest.raises(ValueError):
+        bootstrap_confidence_intervals(height_data, ("mode",))
+    with pytest.raises(ValueError):
+        bootstrap_confidence_intervals(height_data, confidence=1.5)
+    with pytest.raises(TypeError, match="Height data must be a numpy array."):
+        bootstrap_distribution([170, 180])
+
 # Task 7
 
 def test_hypothesis_testing_basic():
@@ -205,6 +297,160 @@ def test_calculate_probability_invalid_input():
     with pytest.raises(ValueError, match="Threshold height must be a positive number."):
         calculate_probability(np.array([160, 170, 180]), -180)
 
+def test_height_distribution_thresholds():
+    """Test vectors of thresholds in the normal and empirical modes."""
+    data = np.array([160, 170, 180, 190, 200, 210])
+    distribution = HeightDistribution(data)
+    thresholds = np.array([150, 180, 185, 210])
+    expected = 1 - norm.cdf(thresholds, loc=np.mean(data), scale=np.std(data))
+    assert np.allclose(distribution.probability_above(thresholds), expected)
+    assert np.allclose(distribution.probability_above(thresholds, "empirical"), [1, 0.5, 0.5, 0])
+    assert calculate_probability(data, 180, mode="empirical") == 0.5
+    assert isinstance(distribution.probability_above(180), np.float64)
+    with pytest.raises(ValueError, match="Threshold height must be a positive number."):
+        distribution.probability_above(np.array([180, -1]))
+    with pytest.raises(TypeError, match="Threshold height must be a number."):
+        distribution.probability_above(np.array(["180"]))
+    with pytest.raises(ValueError):
+        distribution.probability_above(180, "poisson")
+
+# Test Cases for the summary
+def test_summarize_matches_numpy():
+    """Test that summarize gives the same results as the separate numpy functions."""
+    for height_data in (np.random.default_rng(0).normal(170, 10, 10001), np.array([150, 160, 170, 180, 250])):
+        summary = summarize(height_data)
+        assert summary["mean"] == pytest.approx(np.mean(height_data))
+        assert summary["std"] == pytest.approx(np.std(height_data))
+        assert summary["median"] == pytest.approx(np.median(height_data))
+        assert summary["p25"] == pytest.approx(np.percentile(height_data, 25))
+        assert summary["p75"] == pytest.approx(np.percentile(height_data, 75))
+        assert summary["iqr"] == pytest.approx(summary["p75"] - summary["p25"])
+        expected = (height_data < summary["lower_bound"]) | (height_data > summary["upper_bound"])
+        assert np.array_equal(summary["outliers"], expected)
+    assert np.array_equal(summary["outliers"], [False, False, False, False, True])
+
+def test_quartiles_with_nan(tmp_path):
+    """Test that a NaN gives NaN quartiles and bounds like np.percentile, in memory and for a memmap."""
+    height_data = np.array([150, 160, np.nan, 170, 180])
+    np.save(tmp_path / "heights.npy", height_data)
+    for data in (height_data, np.load(tmp_path / "heights.npy", mmap_mode='r')):
+        assert np.isnan(np.percentile(data, [25, 50, 75])).all()
+        assert np.isnan(calculate_percentiles(data)).all()
+        summary = summarize(data)
+        assert np.isnan([summary[key] for key in ("mean", "p25", "p75", "lower_bound", "upper_bound")]).all()
+
+def test_summarize_invalid_input():
+    with pytest.raises(TypeError, match="Height data must be a numpy array."):
+        summarize([160, 170, 180])
+    with pytest.raises(ValueError, match="Height data cannot be empty."):
+        summarize(np.array([]))
+
+# Test Cases for the grouped summary
+def test_grouped_summary_matches_summarize():
+    """Test that every group gets the statistics of summarize on that group alone."""
+    rng = np.random.default_rng(0)
+    height_data = rng.normal(170, 10, 5000)
+    groups = rng.integers(0, 40, 5000)
+    groups[groups == 7] = 8
+    result = grouped_summary(height_data, groups)
+    assert len(result["mean"]) == 40 and result["count"][7] == 0 and np.isnan(result["mean"][7])
+    for group in (0, 8, 39):
+        expected = summarize(height_data[groups == group])
+        for key in ("mean", "median", "std", "p25", "p75", "iqr", "lower_bound", "upper_bound"):
+            assert result[key][group] == pytest.approx(expected[key])
+        assert np.array_equal(result["outliers"][groups == group], expected["outliers"])
+
+def test_grouped_summary_invalid_input():
+    with pytest.raises(TypeError, match="Height data must be a numpy array."):
+        grouped_summary([170, 180], np.array([0, 1]))
+    with pytest.raises(ValueError):
+        grouped_summary(np.array([170, 180]), np.array([0]))
+    with pytest.raises(ValueError):
+        grouped_summary(np.array([170, 180]), np.array([0, -1]))
+
+# Test Cases for the streaming statistics
+def test_height_accumulator_matches_summarize():
+    """Test that merged accumulators of chunks give the statistics of the whole array."""
+    height_data = np.random.default_rng(0).normal(170, 10, 200000)
+    parts = [HeightAccumulator(seed=i) for i in range(3)]
+    for i, chunk in enumerate(np.array_split(height_data, 20)):
+        parts[i % 3].update(chunk)
+    accumulator = HeightAccumulator()
+    for part in parts:
+        accumulator.merge(part)
+    summary, expected = accumulator.summary(), summarize(height_data)
+    assert accumulator.count == len(height_data)
+    assert summary["mean"] == pytest.approx(expected["mean"], rel=1e-12)
+    assert summary["std"] == pytest.approx(expected["std"], rel=1e-12)
+    for key, q in (("p25", 0.25), ("p50", 0.5), ("p75", 0.75)):
+        assert np.mean(height_data < summary[key]) == pytest.approx(q, abs=0.01)
+    t_stat, p_value, _ = hypothesis_testing(accumulator, 170)
+    expected_t, expected_p, _ = hypothesis_testing(height_data, 170)
+    assert t_stat == pytest.approx(expected_t) and p_value == pytest.approx(expected_p)
+
+def test_quantile_sketch_exact_for_small_data():
+    sketch = QuantileSketch(16)
+    sketch.update(np.array([150, 160, 170, 180, 190]))
+    assert list(sketch.quantile([0.25, 0.5, 0.75])) == [160, 170, 180]
+    with pytest.raises(ValueError):
+        sketch.merge(QuantileSketch(32))
+    with pytest.raises(ValueError, match="Height data cannot be empty."):
+        HeightAccumulator().summary()
+    with pytest.raises(TypeError, match="Height data must be a numpy array."):
+        HeightAccumulator().update([170])
+
+def test_accumulate_files(tmp_path):
+    height_data = np.random.default_rng(1).normal(170, 10, 3000)
+    np.save(tmp_path / "heights.npy", height_data[:1000])
+    with open(tmp_path / "heights.csv", "w") as f:
+        f.write("id,height\n")
+        f.writelines(f"{i},{height!r}\n" for i, height in enumerate(height_data[1000:].tolist()))
+    chunks = list(read_height_chunks(str(tmp_path / "heights.csv"), 300, "height"))
+    assert [len(chunk) for chunk in chunks] == [300] * 6 + [200]
+    accumulator = accumulate_files([str(tmp_path / "heights.npy"), str(tmp_path / "heights.csv")], "height",
+                                   chunk_size=256, workers=2, seed=0)
+    assert accumulator.count == 3000
+    assert accumulator.mean == pytest.approx(np.mean(height_data))
+    assert accumulator.std(ddof=1) == pytest.approx(np.std(height_data, ddof=1))
+
+# Test Cases for the batch hypothesis testing
+def test_hypothesis_testing_batch_matches_scipy():
+    """Test that the batched t-tests of rows and of ragged groups match scipy."""
+    rng = np.random.default_rng(0)
+    data = rng.normal(170, 10, (20, 30))
+    t_stats, p_values = hypothesis_testing_batch(data, 168)
+    expected_t, expected_p = ttest_1samp(data, 168, axis=1)
+    assert np.allclose(t_stats, expected_t) and np.allclose(p_values, expected_p)
+
+    groups = np.repeat(np.arange(20), 30)
+    t_grid, p_grid, messages = hypothesis_testing_batch(data.ravel(), np.array([[165], [168]]), groups, messages=True)
+    assert t_grid.shape == (2, 20)
+    assert np.allclose(t_grid[1], expected_t) and np.allclose(p_grid[1], expected_p)
+    assert messages[0, 0] == hypothesis_testing(data[0], 165)[2]
+
+def test_hypothesis_testing_batch_correction():
+    data = np.array([[160, 170, 180], [150, 151, 152], [170, 170.5, 171]])
+    _, p_values = hypothesis_testing_batch(data, 170)
+    _, bonferroni = hypothesis_testing_batch(data, 170, correction="bonferroni")
+    assert np.allclose(bonferroni, np.minimum(p_values * 3, 1))
+    _, holm = hypothesis_testing_batch(data, 170, correction="holm")
+    _, fdr = hypothesis_testing_batch(data, 170, correction="fdr_bh")
+    assert np.all(p_values <= fdr) and np.all(fdr <= holm) and np.all(holm <= bonferroni)
+    _, p_small = hypothesis_testing_batch(np.array([170.0, 160, 180]), 165, np.array([0, 1, 1]))
+    assert np.isnan(p_small[0])
+
+def test_hypothesis_testing_batch_invalid_input():
+    with pytest.raises(TypeError, match="Height data must be a numpy array."):
+        hypothesis_testing_batch([[160, 170]])
+    with pytest.raises(ValueError, match="Height data cannot be empty."):
+        hypothesis_testing_batch(np.empty((0, 3)))
+    with pytest.raises(ValueError):
+        hypothesis_testing_batch(np.array([160, 170]))
+    with pytest.raises(ValueError):
+        hypothesis_testing_batch(np.array([160, 170]), groups=np.array([0]))
+    with pytest.raises(ValueError):
+        hypothesis_testing_batch(np.array([[160, 170]]), correction="sidak")
+
 if __name__ == "__main__":
     #Test for Task1
     test_generate_height_valid_input()
@@ -216,6 +462,7 @@ if __name__ == "__main__":
     # test_visualise_histogram_valid_input()
     test_visualise_histogram_invalid_input_type()
     test_visualise_histogram_empty_array()
+    test_height_histogram_values_on_edges()
     #Test for Task4
     test_calculate_percentiles_valid_input()
     test_calculate_percentiles_invalid_input()
@@ -231,14 +478,30 @@ if __name__ == "__main__":
     test_random_simpling_valid_input()
     test_random_sampling_invalid_input()
     test_random_sampling_unique()
+    test_random_sampling_generator()
+    test_bootstrap_deterministic()
+    test_bootstrap_confidence_intervals()
 
     #Test for Task7
 
     test_hypothesis_testing_basic()
     test_hypothesis_testing_fail_to_reject()
     test_hypothesis_testing_invalid_input()
+    test_hypothesis_testing_batch_matches_scipy()
+    test_hypothesis_testing_batch_correction()
+    test_hypothesis_testing_batch_invalid_input()
 
     #Test for Task8
     test_calculate_probability()
     test_calculate_probability_invalid_input()
+    test_height_distribution_thresholds()
+    #Test for the summary
+    test_summarize_matches_numpy()
+    test_summarize_invalid_input()
+    test_grouped_summary_matches_summarize()
+    test_grouped_summary_invalid_input()
+    #Test for the streaming statistics
+    test_height_accumulator_matches_summarize()
+    test_quantile_sketch_exact_for_small_data()
     print("All tests passed!")
+
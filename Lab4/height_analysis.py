@@ -1,19 +1,47 @@
 
 import numpy as np
 import matplotlib.pyplot as plt
-from scipy.stats import norm, ttest_1samp
+from matplotlib.backends.backend_agg import FigureCanvasAgg
+from matplotlib.figure import Figure
+from scipy.stats import norm, ttest_1samp, t as student_t
+from concurrent.futures import ProcessPoolExecutor
+from itertools import islice
 import warnings
+
+# Number of elements processed at once by the moments pass of summarize, the temporaries stay in cache
+SUMMARY_BLOCK_SIZE = 1 << 16
+# Size parameter of the quantile sketch of HeightAccumulator, the rank error is about 1 / DEFAULT_SKETCH_SIZE
+DEFAULT_SKETCH_SIZE = 512
+# Number of values read at once from .npy and CSV files
+READ_CHUNK_SIZE = 1 << 20
+# Largest number of heights resampled at once by the bootstrap, 128 MB of indices
+BOOTSTRAP_BATCH_ELEMENTS = 1 << 24
+# Multiple-testing corrections of hypothesis_testing_batch
+CORRECTIONS = ("bonferroni", "holm", "fdr_bh")
+# Models of HeightDistribution.probability_above
+PROBABILITY_MODES = ("normal", "empirical")
+# Number of heights generated per random stream when writing to a file or with a seed
+GENERATE_CHUNK_SIZE = 1 << 20
+# Histogram bins per counting pass, and largest number of candidates gathered, of the memmap quantiles
+SELECT_BINS = 1 << 16
+SELECT_GATHER_LIMIT = 1 << 22
 # Task1
-def generate_height_data(size=1000, mean=170, std_dev=10) -> np.ndarray:
+def generate_height_data(size=1000, mean=170, std_dev=10, path=None, seed=None, workers=1) -> np.ndarray:
     """ Generates dataset of 1000 heights with a mean of 170 cm and standard deviation of 10 cm.
 
+    With a seed, every chunk of GENERATE_CHUNK_SIZE heights comes from its own generator spawned from
+    SeedSequence(seed), so the heights are the same in memory and in a file, for any number of workers.
+
     Args:
         size (int, optional): Defaults to 1000.
         mean (int, optional): Defaults to 170.
         std_dev (int, optional): Defaults to 10.
+        path (str, optional): Write the heights to this .npy file chunk by chunk instead of memory.
+        seed (int, optional): Seed of the heights. Defaults to None (global numpy random state in memory).
+        workers (int, optional): Number of processes writing the chunks of the file. Defaults to 1.
 
     Returns:
-        np.ndarray: Array of heights
+        np.ndarray: Array of heights (a read-only np.memmap of the file when path is given)
     Rises:
         ValueError: Size must be a positive integer.
         ValueError: Mean height must be a positive number.
@@ -37,10 +65,264 @@ def generate_height_data(size=1000, mean=170, std_dev=10) -> np.ndarray:
     #Find a conversation here https://chatgpt.com/share/675da94d-5ff0-800c-869f-0119ec943ea2
     if size < 300:
         warnings.warn("Warning: A sample size of less than 300 may not provide reliable statistical estimates.")
+    if path is not None:
+        return _generate_height_file(path, size, mean, std_dev, seed, workers)
+    if seed is not None:
+        return np.concatenate([_generate_chunk(job) for job in _generation_jobs(size, mean, std_dev, seed)])
     # This part of code was generated by ChatGPT for the question: 
     # "Generate a dataset of 1000 heights with a mean of 170 cm and standard deviation of 10 cm."
     return np.random.normal(mean, std_dev, size) 
 
+def _generation_jobs(size: int, mean, std_dev, seed, path: str = None) -> list:
+    """One job per chunk, the chunks and their seeds only depend on size and seed."""
+    starts = range(0, size, GENERATE_CHUNK_SIZE)
+    seeds = np.random.SeedSequence(seed).spawn(len(starts))
+    return [(path, start, min(start + GENERATE_CHUNK_SIZE, size), mean, std_dev, chunk_seed)
+            for start, chunk_seed in zip(starts, seeds)]
+
+def _generate_chunk(job: tuple) -> np.ndarray:
+    path, start, stop, mean, std_dev, seed = job
+    chunk = np.random.default_rng(seed).normal(mean, std_dev, stop - start)
+    if path is None:
+        return chunk
+    output = np.load(path, mmap_mode='r+')
+    output[start:stop] = chunk
+    output.flush()
+    del output
+    return None
+
+def _generate_height_file(path: str, size: int, mean, std_dev, seed, workers: int) -> np.memmap:
+    output = np.lib.format.open_memmap(path, mode='w+', dtype=np.float64, shape=(size,))
+    output.flush()
+    del output
+    jobs = _generation_jobs(size, mean, std_dev, seed, path)
+    if workers == 1:
+        for job in jobs:
+            _generate_chunk(job)
+    else:
+        with ProcessPoolExecutor(max_workers=workers) as executor:
+            list(executor.map(_generate_chunk, jobs))
+    return np.load(path, mmap_mode='r')
+
+# Summary used by Tasks 2, 4 and 5
+def _check_height_data(height_data):
+    if not isinstance(height_data, np.ndarray):
+        raise TypeError("Height data must be a numpy array.")
+    if len(height_data) == 0:
+        raise ValueError("Height data cannot be empty.")
+
+
+def _blocks(height_data: np.ndarray):
+    for start in range(0, len(height_data), SUMMARY_BLOCK_SIZE):
+        yield height_data[start:start + SUMMARY_BLOCK_SIZE]
+
+
+def _bin_index(values: np.ndarray, low: float, high: float) -> np.ndarray:
+    """Histogram bin of every value on [low, high], monotonic in the value."""
+    if high <= low:
+        return np.zeros(len(values), dtype=np.intp)
+    index = np.floor((values - low) * (SELECT_BINS / (high - low)))
+    return np.clip(index, 0, SELECT_BINS - 1).astype(np.intp)
+
+
+def _candidates(block: np.ndarray, chain: tuple) -> np.ndarray:
+    """Values of the block which fell in the chosen bin of every histogram of the chain."""
+    for low, high, chosen in chain:
+        block = block[_bin_index(block, low, high) == chosen]
+    return block
+
+
+def _select_blocked(height_data: np.ndarray, ranks: list) -> dict:
+    """Exact order statistics of an array with a few blocked counting passes instead of a sorted copy.
+
+    Every pass histograms the candidates of each rank and keeps the bin holding the rank. Once few
+    enough candidates are left (normally after one histogram) they are gathered and sorted.
+    """
+    low = min(block.min() for block in _blocks(height_data))
+    high = max(block.max() for block in _blocks(height_data))
+    # rank -> chain of (low, high, chosen bin), values below the candidates, number of candidates,
+    # range of the next histogram
+    state = {rank: ((), 0, len(height_data), low, high) for rank in ranks}
+    result = {}
+    while len(result) < len(ranks):
+        pending = {rank: item for rank, item in state.items() if rank not in result}
+        chains = {item[0]: item for item in pending.values()}
+        # the bins cannot be split further than the float resolution, or a few levels deep
+        gathered = {chain: [] for chain, (_, _, count, chain_low, chain_high) in chains.items()
+                    if count <= SELECT_GATHER_LIMIT or chain_high <= chain_low or len(chain) >= 3}
+        histograms = {chain: np.zeros(SELECT_BINS, dtype=np.int64) for chain in chains if chain not in gathered}
+        for block in _blocks(height_data):
+            for chain, (_, _, _, chain_low, chain_high) in chains.items():
+                values = _candidates(block, chain)
+                if chain in gathered:
+                    gathered[chain].append(values)
+                else:
+                    histograms[chain] += np.bincount(_bin_index(values, chain_low, chain_high), minlength=SELECT_BINS)
+        for rank, (chain, below, count, chain_low, chain_high) in pending.items():
+            if chain in gathered:
+                result[rank] = np.sort(np.concatenate(gathered[chain]))[rank - below]
+                continue
+            cumulative = np.cumsum(histograms[chain])
+            chosen = int(np.searchsorted(cumulative, rank - below, side='right'))
+            width = (chain_high - chain_low) / SELECT_BINS
+            state[rank] = (chain + ((chain_low, chain_high, chosen),),
+                           below + (int(cumulative[chosen - 1]) if chosen else 0),
+                           int(histograms[chain][chosen]),
+                           chain_low + chosen * width, chain_low + (chosen + 1) * width)
+    return result
+
+
+def _quartiles(height_data: np.ndarray) -> tuple:
+    """25th, 50th and 75th percentiles (linear interpolation, like np.percentile) from a single partition.
+
+    A np.memmap is not partitioned, which would copy it into memory, see _select_blocked. Like np.percentile,
+    every quartile is NaN if the data contains a NaN.
+    """
+    n = len(height_data)
+    positions = [(n - 1) * q for q in (0.25, 0.5, 0.75)]
+    kth = sorted({int(np.floor(pos)) for pos in positions} | {int(np.ceil(pos)) for pos in positions})
+    if isinstance(height_data, np.memmap):
+        if any(np.isnan(block.max()) for block in _blocks(height_data)):
+            return (np.float64(np.nan),) * 3
+        partitioned = _select_blocked(height_data, kth)
+    else:
+        # the largest value is placed last as well, np.partition sorts NaN after every number
+        partitioned = np.partition(height_data, kth + [n - 1])
+        if np.isnan(partitioned[-1]):
+            return (np.float64(np.nan),) * 3
+    quartiles = []
+    for pos in positions:
+        low, high = partitioned[int(np.floor(pos))], partitioned[int(np.ceil(pos))]
+        quartiles.append(np.float64(low + (high - low) * (pos - np.floor(pos))))
+    return tuple(quartiles)
+
+
+def _blocked_moments(height_data: np.ndarray, shift: float = None) -> tuple:
+    """Mean and sum of squared deviations in one blocked pass, without array-sized temporaries.
+
+    The values are shifted (by the first one by default) so the sums do not lose precision.
+    """
+    if shift is None:
+        shift = float(height_data[0])
+    shifted_sum = 0.0
+    shifted_squares = 0.0
+    for block in _blocks(height_data):
+        shifted = block - shift
+        shifted_sum += shifted.sum()
+        shifted_squares += np.dot(shifted, shifted)
+    n = len(height_data)
+    shifted_mean = shifted_sum / n
+    return np.float64(shift + shifted_mean), max(shifted_squares - n * shifted_mean ** 2, 0.0)
+
+
+def summarize(height_data: np.ndarray) -> dict:
+    """Calculates every summary statistic of the height data with one partition and one pass over the data.
+
+    The quartiles come from a single np.partition, then the moments and the outlier mask are calculated
+    together block by block. The moments are shifted by the median, so the sums do not lose precision.
+
+    Args:
+        height_data (np.ndarray): Array of heights
+
+    Returns:
+        dict: "mean", "median", "std", "p25", "p50", "p75", "iqr", "lower_bound", "upper_bound"
+            and "outliers", a boolean mask of the values outside the IQR bounds.
+    Raises:
+        TypeError: Height data must be a numpy array.
+        ValueError: Height data cannot be empty.
+    """
+    _check_height_data(height_data)
+    n = len(height_data)
+    p25, p50, p75 = _quartiles(height_data)
+    iqr = p75 - p25
+    lower_bound = p25 - 1.5 * iqr
+    upper_bound = p75 + 1.5 * iqr
+
+    outliers = np.empty(n, dtype=bool)
+    above = np.empty(min(n, SUMMARY_BLOCK_SIZE), dtype=bool)
+    shifted_sum = 0.0
+    shifted_squares = 0.0
+    for start in range(0, n, SUMMARY_BLOCK_SIZE):
+        block = height_data[start:start + SUMMARY_BLOCK_SIZE]
+        shifted = block - p50
+        shifted_sum += shifted.sum()
+        shifted_squares += np.dot(shifted, shifted)
+        mask = outliers[start:start + len(block)]
+        np.less(block, lower_bound, out=mask)
+        np.greater(block, upper_bound, out=above[:len(block)])
+        mask |= above[:len(block)]
+    shifted_mean = shifted_sum / n
+    return {
+        "mean": np.float64(p50 + shifted_mean),
+        "median": p50,
+        "std": np.float64(np.sqrt(max(shifted_squares / n - shifted_mean ** 2, 0.0))),
+        "p25": p25,
+        "p50": p50,
+        "p75": p75,
+        "iqr": iqr,
+        "lower_bound": lower_bound,
+        "upper_bound": upper_bound,
+        "outliers": outliers,
+    }
+
+def grouped_summary(height_data: np.ndarray, groups: np.ndarray) -> dict:
+    """Calculates the statistics of summarize for every group of heights with a single sort.
+
+    The heights are sorted by group and then by value once, so every group is a sorted segment: the
+    quartiles are read at their positions in the segment and the moments are segmented sums
+    (np.add.reduceat). No group is copied out of the data.
+
+    Args:
+        height_data (np.ndarray): Array of heights
+        groups (np.ndarray): Group index (0 to number of groups - 1) of every height
+
+    Returns:
+        dict: "count", "mean", "median", "std", "p25", "p50", "p75", "iqr", "lower_bound" and "upper_bound",
+            arrays indexed by group (NaN for groups without heights), and "outliers", a boolean mask of the
+            heights outside the IQR bounds of their group.
+    Raises:
+        TypeError: Height data must be a numpy array.
+        ValueError: Height data cannot be empty.
+        ValueError: If groups does not match the data or is not made of non-negative integers.
+    """
+    _check_height_data(height_data)
+    groups = np.asarray(groups)
+    if height_data.ndim != 1 or groups.shape != height_data.shape:
+        raise ValueError("Groups must have one index per height.")
+    if not np.issubdtype(groups.dtype, np.integer) or groups.min() < 0:
+        raise ValueError("Groups must be non-negative integers.")
+
+    # sorted by value, then stably by group: the same order as np.lexsort((height_data, groups)), faster
+    order = np.argsort(height_data)
+    order = order[np.argsort(groups[order], kind='stable')]
+    sorted_data = height_data[order]
+    counts = np.bincount(groups)
+    present = np.flatnonzero(counts)
+    sizes = counts[present]
+    starts = np.concatenate(([0], np.cumsum(sizes)[:-1]))
+
+    def segment_percentile(q: float) -> np.ndarray:
+        position = (sizes - 1) * q
+        below = np.floor(position).astype(np.intp)
+        above = np.ceil(position).astype(np.intp)
+        low, high = sorted_data[starts + below], sorted_data[starts + above]
+        return low + (high - low) * (position - below)
+
+    means = np.add.reduceat(sorted_data, starts) / sizes
+    deviations = sorted_data - np.repeat(means, sizes)
+    stds = np.sqrt(np.add.reduceat(deviations * deviations, starts) / sizes)
+    p25, p50, p75 = (segment_percentile(q) for q in (0.25, 0.5, 0.75))
+    iqr = p75 - p25
+
+    result = {"count": counts}
+    for key, values in (("mean", means), ("median", p50), ("std", stds), ("p25", p25), ("p50", p50),
+                        ("p75", p75), ("iqr", iqr), ("lower_bound", p25 - 1.5 * iqr),
+                        ("upper_bound", p75 + 1.5 * iqr)):
+        result[key] = np.full(len(counts), np.nan)
+        result[key][present] = values
+    result["outliers"] = (height_data < result["lower_bound"][groups]) | (height_data > result["upper_bound"][groups])
+    return result
+
 # Task2
 def descriptive_statistics(height_data:np.array) -> tuple:
     """Calculates the mean, median and standard deviation of the height data.
@@ -56,29 +338,110 @@ def descriptive_statistics(height_data:np.array) -> tuple:
         ValueError: Height data cannot be empty.
     
     """
-    if not isinstance(height_data, np.ndarray):
-        raise TypeError("Height data must be a numpy array.")
-    if len(height_data) == 0:
-        raise ValueError("Height data cannot be empty.")
-    
-    mean = np.mean(height_data)
-    median = np.median(height_data)
-    std_dev = np.std(height_data)
-    return (mean, median, std_dev)
+    summary = summarize(height_data)
+    return (summary["mean"], summary["median"], summary["std"])
 
 # Task3
-def visualise_histogram(height_data:np.ndarray):
+class HeightHistogram:
+    """Histogram of heights over fixed, equal-width bins, filled chunk by chunk.
+
+    Histograms of shards of the data with the same bins can be merged, and rendering only plots the
+    bin counts, so its cost does not depend on the number of heights.
+
+    Attributes:
+        edges (np.ndarray): Bin edges, the last bin includes its right edge like np.histogram.
+        counts (np.ndarray): Number of heights per bin.
+        underflow (int): Number of heights below the first edge.
+        overflow (int): Number of heights above the last edge.
+    """
+
+    def __init__(self, low: float, high: float, bins: int = 30):
+        """Creates an empty histogram of `bins` bins between low and high.
+
+        Raises:
+            ValueError: If bins is not positive or high is not larger than low.
+        """
+        if not isinstance(bins, int) or bins <= 0:
+            raise ValueError("Number of bins must be a positive integer.")
+        if not high > low:
+            raise ValueError("The upper edge must be larger than the lower edge.")
+        self.edges = np.linspace(low, high, bins + 1)
+        self.counts = np.zeros(bins, dtype=np.int64)
+        self.underflow = 0
+        self.overflow = 0
+
+    @classmethod
+    def from_data(cls, height_data: np.ndarray, bins: int = 30) -> 'HeightHistogram':
+        """Histogram of the height data over its range, the same bins as np.histogram(height_data, bins).
+
+        Raises:
+            TypeError: Height data must be a numpy array.
+            ValueError: Height data cannot be empty.
+        """
+        _check_height_data(height_data)
+        low = min(block.min() for block in _blocks(height_data))
+        high = max(block.max() for block in _blocks(height_data))
+        if low == high:
+            # np.histogram widens an empty range the same way
+            low, high = low - 0.5, high + 0.5
+        histogram = cls(low, high, bins)
+        histogram.update(height_data)
+        return histogram
+
+    def update(self, height_data: np.ndarray):
+        """Adds the heights of an array (or of a chunk of the data) to the histogram."""
+        if not isinstance(height_data, np.ndarray):
+            raise TypeError("Height data must be a numpy array.")
+        low, high = self.edges[0], self.edges[-1]
+        bins = len(self.counts)
+        for block in _blocks(height_data.ravel()):
+            inside = block[(block >= low) & (block <= high)]
+            self.underflow += int(np.count_nonzero(block < low))
+            self.overflow += int(np.count_nonzero(block > high))
+            # compared with the edges themselves, as np.histogram does, a value on an edge goes to the bin it
+            # starts (dividing by the bin width can round it into the previous bin)
+            index = np.minimum(np.searchsorted(self.edges, inside, side='right') - 1, bins - 1)
+            self.counts += np.bincount(index, minlength=bins)
+
+    def merge(self, other: 'HeightHistogram'):
+        """Adds the counts of another histogram with the same bins.
+
+        Raises:
+            ValueError: If the bins differ.
+        """
+        if not np.array_equal(self.edges, other.edges):
+            raise ValueError("Histograms with different bins cannot be merged.")
+        self.counts += other.counts
+        self.underflow += other.underflow
+        self.overflow += other.overflow
+
+    def _draw(self, ax):
+        ax.stairs(self.counts, self.edges, fill=True, edgecolor='black', alpha=0.7)
+        ax.set_title('Histogram of Heights')
+        ax.set_xlabel('Height (cm)')
+        ax.set_ylabel('Frequency')
+        ax.grid(axis='y', alpha=0.75)
+
+    def render(self, path: str, dpi: int = 100):
+        """Saves the histogram as a PNG image with the Agg backend, without a display or pyplot."""
+        figure = Figure()
+        FigureCanvasAgg(figure)
+        self._draw(figure.add_subplot())
+        figure.savefig(path, format='png', dpi=dpi)
+
+
+def visualise_histogram(height_data:np.ndarray, path: str = None):
     """Creates a histogram of the height data.
+
+    Args:
+        height_data (np.ndarray): Array of heights
+        path (str, optional): Save the histogram to this PNG file instead of showing it.
     """
-    if not isinstance(height_data, np.ndarray):
-        raise TypeError("Height data must be a numpy array.")
-    if len(height_data) == 0:
-        raise ValueError("Height data cannot be empty.")
-    plt.hist(height_data, bins=30, edgecolor='black', alpha=0.7)
-    plt.title('Histogram of Heights')
-    plt.xlabel('Height (cm)')
-    plt.ylabel('Frequency')
-    plt.grid(axis='y', alpha=0.75)
+    histogram = HeightHistogram.from_data(height_data, bins=30)
+    if path is not None:
+        histogram.render(path)
+        return
+    histogram._draw(plt.gca())
     plt.show()
 
 # Task4
@@ -95,14 +458,8 @@ def calculate_percentiles(height_data:np.ndarray) -> tuple:
         ValueError: Height data cannot be empty.
         
     """
-    if not isinstance(height_data, np.ndarray):
-        raise TypeError("Height data must be a numpy array.")
-    if len(height_data) == 0:
-        raise ValueError("Height data cannot be empty.")
-    p25 = np.percentile(height_data, 25)
-    p50 = np.percentile(height_data, 50)
-    p75 = np.percentile(height_data, 75)
-    return p25, p50, p75
+    _check_height_data(height_data)
+    return _quartiles(height_data)
 
 # Task5
 def identify_outliers(height_data:np.ndarray) -> np.ndarray:
@@ -117,55 +474,173 @@ def identify_outliers(height_data:np.ndarray) -> np.ndarray:
         TypeError: Height data must be a numpy array.
         ValueError: Height data cannot be empty.
     """
-    if not isinstance(height_data, np.ndarray):
-        raise TypeError("Height data must be a numpy array.")
-    if len(height_data) == 0:
-        raise ValueError("Height data cannot be empty.")
-    
-    q1 = np.percentile(height_data, 25)
-    q3 = np.percentile(height_data, 75)
-    iqr = q3 - q1
-    lower_bound = q1 - 1.5 * iqr
-    upper_bound = q3 + 1.5 * iqr
-    outliers = height_data[(height_data < lower_bound) | (height_data > upper_bound)]
-    return outliers
+    return height_data[summarize(height_data)["outliers"]]
 
 # Task6
-def random_sampling(height_data:np.ndarray) -> np.ndarray:
-    """Performs random sampling of 50 heights from the data.
+def random_sampling(height_data:np.ndarray, size: int = 50, rng: np.random.Generator = None) -> np.ndarray:
+    """Performs random sampling of `size` heights from the data, without replacement.
 
     Args:
         height_data (np.ndarray): Array of heights
+        size (int, optional): Number of heights in the sample. Defaults to 50.
+        rng (np.random.Generator, optional): Generator to draw the sample with, reproducible and much
+            faster for large arrays. Defaults to the global numpy random state.
 
     Returns:
-        np.ndarray: Random sample of 50 heights
+        np.ndarray: Random sample of `size` heights
     Raises:
         TypeError: Height data must be a numpy array.
-        ValueError: Height data cannot be empty.
+        ValueError: Height data cannot be empty, or has fewer than `size` heights.
     """
     if not isinstance(height_data, np.ndarray):
         raise TypeError("Height data must be a numpy array.")
     if len(height_data) == 0:
         raise ValueError("Height data cannot be empty.")
-    sample = np.random.choice(height_data, size=50, replace=False)
+    if rng is not None:
+        # Generator.choice does not permute the whole array to draw a small sample
+        return rng.choice(height_data, size=size, replace=False)
+    sample = np.random.choice(height_data, size=size, replace=False)
     return sample
 
+# Bootstrap built on the resampling of Task6
+def _parse_statistics(statistics) -> list:
+    """Validates statistic names: "mean", "std", "median" or "pNN" (NNth percentile)."""
+    if isinstance(statistics, str):
+        statistics = [statistics]
+    parsed = []
+    for name in statistics:
+        if name in ("mean", "std", "median"):
+            parsed.append(name)
+            continue
+        try:
+            q = float(name[1:]) if name.startswith("p") else None
+        except ValueError:
+            q = None
+        if q is None or not 0 <= q <= 100:
+            raise ValueError(f"Unknown statistic {name}, use mean, std, median or pNN.")
+        parsed.append(name)
+    return parsed
+
+
+def _compute_statistics(samples: np.ndarray, statistics: list) -> np.ndarray:
+    """Every statistic of every row of samples, shape (len(statistics), rows)."""
+    result = np.empty((len(statistics), samples.shape[0]))
+    qs = [50.0 if name == "median" else float(name[1:]) for name in statistics if name not in ("mean", "std")]
+    # all percentiles of a row come from one partition of it
+    percentiles = iter(np.percentile(samples, qs, axis=1)) if qs else iter(())
+    for i, name in enumerate(statistics):
+        if name == "mean":
+            result[i] = samples.mean(axis=1)
+        elif name == "std":
+            result[i] = samples.std(axis=1)
+        else:
+            result[i] = next(percentiles)
+    return result
+
+
+# Heights resampled by every worker process, set once by _init_bootstrap_worker
+_bootstrap_data = None
+
+
+def _init_bootstrap_worker(height_data: np.ndarray):
+    global _bootstrap_data
+    _bootstrap_data = height_data
+
+
+def _bootstrap_shard(job: tuple) -> np.ndarray:
+    """Statistics of one shard of resamples, drawn as a single index matrix."""
+    statistics, n_resamples, seed = job
+    rng = np.random.default_rng(seed)
+    indices = rng.integers(0, len(_bootstrap_data), size=(n_resamples, len(_bootstrap_data)))
+    return _compute_statistics(_bootstrap_data[indices], statistics)
+
+
+def bootstrap_distribution(height_data: np.ndarray, statistics=("mean", "median"), n_resamples: int = 1000,
+                           seed: int = None, workers: int = 1) -> np.ndarray:
+    """Draws bootstrap resamples (with replacement) of the heights and calculates statistics of each.
+
+    The resamples are split into shards of at most BOOTSTRAP_BATCH_ELEMENTS heights. Every shard draws
+    its index matrix with its own generator spawned from SeedSequence(seed), so the result only depends
+    on the seed and not on the number of workers.
+
+    Args:
+        height_data (np.ndarray): Array of heights
+        statistics (tuple, optional): Names of the statistics: "mean", "std", "median" or "pNN" (NNth percentile).
+        n_resamples (int, optional): Number of resamples. Defaults to 1000.
+        seed (int, optional): Seed of the resampling. Defaults to None (not reproducible).
+        workers (int, optional): Number of worker processes sharing the shards. Defaults to 1 (no pool).
+
+    Returns:
+        np.ndarray: Array of shape (number of statistics, n_resamples).
+    Raises:
+        TypeError: Height data must be a numpy array.
+        ValueError: Height data cannot be empty.
+        ValueError: If a statistic is unknown or n_resamples is not positive.
+    """
+    _check_height_data(height_data)
+    statistics = _parse_statistics(statistics)
+    if not isinstance(n_resamples, int) or n_resamples <= 0:
+        raise ValueError("Number of resamples must be a positive integer.")
+    shard_size = max(1, BOOTSTRAP_BATCH_ELEMENTS // len(height_data))
+    sizes = [min(shard_size, n_resamples - start) for start in range(0, n_resamples, shard_size)]
+    seeds = np.random.SeedSequence(seed).spawn(len(sizes))
+    jobs = [(statistics, size, shard_seed) for size, shard_seed in zip(sizes, seeds)]
+    if workers == 1:
+        _init_bootstrap_worker(height_data)
+        try:
+            shards = [_bootstrap_shard(job) for job in jobs]
+        finally:
+            _init_bootstrap_worker(None)
+    else:
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_bootstrap_worker,
+                                 initargs=(height_data,)) as executor:
+            shards = list(executor.map(_bootstrap_shard, jobs))
+    return np.concatenate(shards, axis=1)
+
+
+def bootstrap_confidence_intervals(height_data: np.ndarray, statistics=("mean", "median"),
+                                   n_resamples: int = 1000, confidence: float = 0.95, seed: int = None,
+                                   workers: int = 1) -> dict:
+    """Calculates percentile bootstrap confidence intervals of statistics of the heights.
+
+    Args:
+        height_data (np.ndarray): Array of heights
+        statistics (tuple, optional): Names of the statistics, see bootstrap_distribution.
+        n_resamples (int, optional): Number of resamples. Defaults to 1000.
+        confidence (float, optional): Confidence level. Defaults to 0.95.
+        seed (int, optional): Seed of the resampling. Defaults to None (not reproducible).
+        workers (int, optional): Number of worker processes. Defaults to 1.
+
+    Returns:
+        dict: For every statistic, a tuple of its value on the data and the lower and upper bounds.
+    Raises:
+        ValueError: If confidence is not between 0 and 1, see also bootstrap_distribution.
+    """
+    if not 0 < confidence < 1:
+        raise ValueError("Confidence must be between 0 and 1.")
+    statistics = _parse_statistics(statistics)
+    distribution = bootstrap_distribution(height_data, statistics, n_resamples, seed, workers)
+    alpha = (1 - confidence) / 2
+    low, high = np.percentile(distribution, [100 * alpha, 100 * (1 - alpha)], axis=1)
+    estimates = _compute_statistics(height_data.reshape(1, -1), statistics)[:, 0]
+    return {name: (estimates[i], low[i], high[i]) for i, name in enumerate(statistics)}
+
 # Task7
 
 def hypothesis_testing(data: np.ndarray, null_hypothesis_mean=165) -> tuple:
     """Performs a one-sample t-test to test the null hypothesis that the mean height is equal to a specified value.
 
     Args:
-        data (np.ndarray): Array of heights
+        data (np.ndarray or HeightAccumulator): Array of heights, or the statistics of streamed heights
         null_hypothesis_mean (int or float, optional): Mean height for the null hypothesis. Defaults to 165.
 
     Returns:
         tuple: t-statistic, p-value, result message (text)
     """
     # Input validation
-    if not isinstance(data, np.ndarray):
+    if not isinstance(data, (np.ndarray, HeightAccumulator)):
         raise TypeError("Height data must be a numpy array.")
-    if len(data) == 0:
+    if (data.count if isinstance(data, HeightAccumulator) else len(data)) == 0:
         raise ValueError("Height data cannot be empty.")
     if not isinstance(null_hypothesis_mean, (int, float)):
         raise TypeError("Null hypothesis mean must be a number.")
@@ -173,22 +648,122 @@ def hypothesis_testing(data: np.ndarray, null_hypothesis_mean=165) -> tuple:
         raise ValueError("Null hypothesis mean must be a positive number.")
 
     # Perform one-sample t-test
-    t_stat, p_value = ttest_1samp(data, null_hypothesis_mean)
+    if isinstance(data, (HeightAccumulator, np.memmap)):
+        # the same test from the accumulated (or blocked, not to copy the memmap) moments
+        if isinstance(data, np.memmap):
+            count, (mean, m2) = len(data), _blocked_moments(data)
+        else:
+            count, mean, m2 = data.count, data.mean, data.m2
+        t_stat = (mean - null_hypothesis_mean) / (np.sqrt(m2 / (count - 1)) / np.sqrt(count))
+        p_value = 2 * student_t.sf(abs(t_stat), count - 1)
+    else:
+        t_stat, p_value = ttest_1samp(data, null_hypothesis_mean)
 
     # Prepare the result message based on the p-value
-    if p_value < 0.05:
-        result_message = f"Reject the null hypothesis: The average height is significantly different from {null_hypothesis_mean} cm."
-    else:
-        result_message = f"Fail to reject the null hypothesis: The average height is not significantly different from {null_hypothesis_mean} cm."
+    result_message = _result_message(p_value, null_hypothesis_mean)
 
     return t_stat, p_value, result_message
 
-def calculate_probability(data:np.ndarray, threshold_height=180) -> np.float64:
+def _result_message(p_value, null_hypothesis_mean, alpha=0.05) -> str:
+    if p_value < alpha:
+        return f"Reject the null hypothesis: The average height is significantly different from {null_hypothesis_mean} cm."
+    return f"Fail to reject the null hypothesis: The average height is not significantly different from {null_hypothesis_mean} cm."
+
+def _adjust_p_values(p_values: np.ndarray, correction: str) -> np.ndarray:
+    """Multiple-testing correction of an array of p-values, NaN p-values are not counted as tests."""
+    flat = p_values.ravel()
+    valid = np.flatnonzero(~np.isnan(flat))
+    m = len(valid)
+    adjusted = flat.copy()
+    if m == 0:
+        return p_values
+    order = valid[np.argsort(flat[valid], kind='stable')]
+    ranked = flat[order]
+    if correction == "bonferroni":
+        result = ranked * m
+    elif correction == "holm":
+        result = np.maximum.accumulate(ranked * (m - np.arange(m)))
+    else:
+        # Benjamini-Hochberg false discovery rate
+        result = np.minimum.accumulate((ranked * m / np.arange(1, m + 1))[::-1])[::-1]
+    adjusted[order] = np.minimum(result, 1.0)
+    return adjusted.reshape(p_values.shape)
+
+def hypothesis_testing_batch(data: np.ndarray, null_hypothesis_means=165, groups: np.ndarray = None,
+                             correction: str = None, alpha: float = 0.05, messages: bool = False) -> tuple:
+    """Performs one-sample t-tests of many groups of heights at once.
+
+    The group means and variances are calculated in one vectorised pass (np.bincount for ragged groups)
+    and the p-values come from the t distribution, the same as hypothesis_testing per group.
+
+    Args:
+        data (np.ndarray): 2-D array with one group of heights per row, or 1-D array of heights split by groups.
+        null_hypothesis_means (int, float or np.ndarray, optional): Null hypothesis means, broadcast against
+            the groups. Shape (M, 1) tests every group against M means. Defaults to 165.
+        groups (np.ndarray, optional): Group index (0 to number of groups - 1) of every height of a 1-D data.
+        correction (str, optional): Multiple-testing correction of the p-values: "bonferroni", "holm"
+            or "fdr_bh" (Benjamini-Hochberg). Defaults to None.
+        alpha (float, optional): Significance level of the messages. Defaults to 0.05.
+        messages (bool, optional): Whether to also return the result messages. Defaults to False.
+
+    Returns:
+        tuple: t-statistics, p-values (arrays, NaN for groups of fewer than 2 heights)
+            and, if messages is True, an array of result messages
+    Raises:
+        TypeError: Height data must be a numpy array.
+        ValueError: Height data cannot be empty.
+        ValueError: If groups does not match the data, or the correction is unknown.
+    """
+    if not isinstance(data, np.ndarray):
+        raise TypeError("Height data must be a numpy array.")
+    if data.size == 0:
+        raise ValueError("Height data cannot be empty.")
+    null_hypothesis_means = np.asarray(null_hypothesis_means, dtype=np.float64)
+    if np.any(null_hypothesis_means <= 0):
+        raise ValueError("Null hypothesis mean must be a positive number.")
+    if correction is not None and correction not in CORRECTIONS:
+        raise ValueError(f"Correction must be one of {', '.join(CORRECTIONS)}.")
+
+    if groups is None:
+        if data.ndim != 2:
+            raise ValueError("Height data must be a 2-D array when no groups are given.")
+        counts = np.full(data.shape[0], data.shape[1], dtype=np.float64)
+        means = data.mean(axis=1)
+        variances = data.var(axis=1, ddof=1) if data.shape[1] > 1 else np.full(len(means), np.nan)
+    else:
+        groups = np.asarray(groups)
+        if data.ndim != 1 or groups.shape != data.shape:
+            raise ValueError("Groups must have one index per height.")
+        if not np.issubdtype(groups.dtype, np.integer) or groups.min() < 0:
+            raise ValueError("Groups must be non-negative integers.")
+        counts = np.bincount(groups).astype(np.float64)
+        with np.errstate(invalid='ignore', divide='ignore'):
+            means = np.bincount(groups, weights=data) / counts
+            deviations = data - means[groups]
+            variances = np.bincount(groups, weights=deviations * deviations) / (counts - 1)
+
+    with np.errstate(invalid='ignore', divide='ignore'):
+        variances = np.where(counts > 1, variances, np.nan)
+        t_stats = (means - null_hypothesis_means) / np.sqrt(variances / counts)
+        p_values = 2 * student_t.sf(np.abs(t_stats), counts - 1)
+    if correction is not None:
+        p_values = _adjust_p_values(p_values, correction)
+    if not messages:
+        return t_stats, p_values
+    means_grid = np.broadcast_to(null_hypothesis_means, p_values.shape)
+    result_messages = np.array([_result_message(p_value, f"{mean:g}", alpha)
+                                for p_value, mean in zip(p_values.ravel(), means_grid.ravel())],
+                               dtype=object).reshape(p_values.shape)
+    return t_stats, p_values, result_messages
+
+def calculate_probability(data:np.ndarray, threshold_height=180, mode="normal") -> np.float64:
     """Calculates the probability of finding a height greater than 180 cm in the dataset.
 
     Args:
         data (np.ndarray): Array of heights
         threshold_height (int, optional): . Defaults to 180.
+        mode (str, optional): "normal" for the normal model with the mean and standard deviation of the
+            data, "empirical" for the fraction of heights above the threshold. Defaults to "normal".
 
     Returns:
         np.float64: 
@@ -201,11 +776,308 @@ def calculate_probability(data:np.ndarray, threshold_height=180) -> np.float64:
         raise TypeError("Threshold height must be a number.")
     if threshold_height <= 0:
         raise ValueError("Threshold height must be a positive number.")
-    mean = np.mean(data)
-    std_dev = np.std(data)
-    #The part of code below was generated by ChatGPT for the question: "Calculate the probability of finding a height greater than 180 cm in the dataset."
-    probability = 1 - norm.cdf(threshold_height, loc=mean, scale=std_dev)
-    return probability
+    return HeightDistribution(data).probability_above(threshold_height, mode)
+
+class HeightDistribution:
+    """Height data prepared for many probability queries.
+
+    The mean and standard deviation are calculated once, the sorted heights on the first empirical
+    query, after which every threshold costs O(log n).
+
+    Attributes:
+        count (int): Number of heights.
+        mean (float): Mean of the heights.
+        std (float): Standard deviation of the heights (like np.std).
+    """
+
+    def __init__(self, data: np.ndarray):
+        """Prepares the height data.
+
+        Raises:
+            TypeError: Height data must be a numpy array.
+            ValueError: Height data cannot be empty.
+        """
+        _check_height_data(data)
+        self._data = data
+        self.count = len(data)
+        self.mean, m2 = _blocked_moments(data)
+        self.std = np.sqrt(m2 / self.count)
+        self._sorted = None
+
+    @property
+    def sorted_data(self) -> np.ndarray:
+        """The heights in ascending order, sorted on the first use."""
+        if self._sorted is None:
+            self._sorted = np.sort(self._data)
+        return self._sorted
+
+    def probability_above(self, thresholds, mode: str = "normal"):
+        """Probability of a height greater than every threshold.
+
+        Args:
+            thresholds (int, float or np.ndarray): Threshold heights.
+            mode (str, optional): "normal" (normal model) or "empirical" (fraction of the heights).
+
+        Returns:
+            np.float64 for a single threshold, otherwise np.ndarray of the shape of thresholds.
+        Raises:
+            TypeError: Threshold height must be a number.
+            ValueError: Threshold height must be a positive number.
+            ValueError: If the mode is unknown.
+        """
+        if mode not in PROBABILITY_MODES:
+            raise ValueError(f"Mode must be one of {', '.join(PROBABILITY_MODES)}.")
+        values = np.asarray(thresholds)
+        if not (np.issubdtype(values.dtype, np.integer) or np.issubdtype(values.dtype, np.floating)):
+            raise TypeError("Threshold height must be a number.")
+        if np.any(values <= 0):
+            raise ValueError("Threshold height must be a positive number.")
+        if mode == "normal":
+            #The part of code below was generated by ChatGPT for the question: "Calculate the probability of finding a height greater than 180 cm in the dataset."
+            probability = 1 - norm.cdf(values, loc=self.mean, scale=self.std)
+        else:
+            above = self.count - np.searchsorted(self.sorted_data, values, side='right')
+            probability = above / self.count
+        return np.float64(probability) if probability.ndim == 0 else probability
+
+# Streaming statistics for data larger than memory
+class QuantileSketch:
+    """Mergeable KLL sketch of the quantiles of a stream of values.
+
+    Values are kept in levels, a value of level h stands for 2**h values of the stream. When a level
+    exceeds its capacity it is sorted and every second value (with a random offset) moves one level up.
+    The capacities shrink geometrically towards the lower levels, so the sketch keeps about 3 * k values
+    whatever the length of the stream. Until the first compaction the quantiles are exact.
+
+    Attributes:
+        k (int): Capacity of the top level.
+        count (int): Number of values added.
+        levels (list): np.ndarray of values per level.
+    """
+
+    def __init__(self, k: int = DEFAULT_SKETCH_SIZE, seed=None):
+        if not isinstance(k, int) or k < 8:
+            raise ValueError("Sketch size must be an integer of at least 8.")
+        self.k = k
+        self.count = 0
+        self.levels = [np.empty(0)]
+        self._rng = np.random.default_rng(seed)
+
+    def _capacity(self, level: int) -> int:
+        depth = len(self.levels) - level - 1
+        return max(2, int(np.ceil(self.k * (2 / 3) ** depth)))
+
+    def _compress(self):
+        compacted = True
+        while compacted:
+            compacted = False
+            for level in range(len(self.levels)):
+                items = self.levels[level]
+                if len(items) <= self._capacity(level):
+                    continue
+                if level + 1 == len(self.levels):
+                    self.levels.append(np.empty(0))
+                items = np.sort(items)
+                # with an odd number of values one of them stays on this level
+                kept = items[-1:] if len(items) % 2 else items[:0]
+                promoted = items[self._rng.integers(2):len(items) - len(kept):2]
+                self.levels[level] = kept
+                self.levels[level + 1] = np.concatenate([self.levels[level + 1], promoted])
+                compacted = True
+
+    def update(self, values: np.ndarray):
+        """Adds the values of an array to the sketch."""
+        values = np.asarray(values, dtype=np.float64).ravel()
+        self.levels[0] = np.concatenate([self.levels[0], values])
+        self.count += len(values)
+        self._compress()
+
+    def merge(self, other: 'QuantileSketch'):
+        """Adds every value summarised by another sketch to this one.
+
+        Raises:
+            ValueError: If the sketch sizes differ.
+        """
+        if other.k != self.k:
+            raise ValueError("Sketches of different sizes cannot be merged.")
+        for level, items in enumerate(other.levels):
+            if level == len(self.levels):
+                self.levels.append(np.empty(0))
+            self.levels[level] = np.concatenate([self.levels[level], items])
+        self.count += other.count
+        self._compress()
+
+    def quantile(self, q):
+        """Estimated q-quantile(s) of the values, q between 0 and 1.
+
+        Raises:
+            ValueError: If the sketch is empty.
+        """
+        if self.count == 0:
+            raise ValueError("Height data cannot be empty.")
+        if len(self.levels) == 1:
+            return np.quantile(self.levels[0], q)
+        values = np.concatenate(self.levels)
+        weights = np.concatenate([np.full(len(items), 2.0 ** level) for level, items in enumerate(self.levels)])
+        order = np.argsort(values)
+        cumulative = np.cumsum(weights[order])
+        ranks = np.searchsorted(cumulative, np.asarray(q) * cumulative[-1], side='left')
+        return values[order][np.minimum(ranks, len(values) - 1)]
+
+
+class HeightAccumulator:
+    """Statistics of height data consumed chunk by chunk, for data which does not fit in memory.
+
+    The mean and variance are updated with Welford's algorithm (merged per chunk with Chan's formula),
+    the quartiles come from a QuantileSketch. Accumulators of parts of the data, e.g. from parallel
+    workers, can be merged. hypothesis_testing accepts an accumulator instead of an array.
+
+    Attributes:
+        count (int): Number of heights consumed.
+        mean (float): Mean of the heights.
+        m2 (float): Sum of the squared deviations from the mean.
+        sketch (QuantileSketch): Quantiles of the heights.
+    """
+
+    def __init__(self, sketch_size: int = DEFAULT_SKETCH_SIZE, seed=None):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.sketch = QuantileSketch(sketch_size, seed)
+
+    def _combine(self, count: int, mean: float, m2: float):
+        total = self.count + count
+        delta = mean - self.mean
+        self.mean += delta * count / total
+        self.m2 += m2 + delta * delta * self.count * count / total
+        self.count = total
+
+    def update(self, chunk: np.ndarray):
+        """Consumes a chunk of heights, empty chunks are ignored.
+
+        Raises:
+            TypeError: Height data must be a numpy array.
+        """
+        if not isinstance(chunk, np.ndarray):
+            raise TypeError("Height data must be a numpy array.")
+        chunk = chunk.ravel()
+        if len(chunk) == 0:
+            return
+        chunk_mean = chunk.mean(dtype=np.float64)
+        deviations = chunk - chunk_mean
+        self._combine(len(chunk), chunk_mean, float(np.dot(deviations, deviations)))
+        self.sketch.update(chunk)
+
+    def merge(self, other: 'HeightAccumulator'):
+        """Adds the statistics of another accumulator to this one."""
+        if other.count == 0:
+            return
+        self._combine(other.count, other.mean, other.m2)
+        self.sketch.merge(other.sketch)
+
+    def _check_not_empty(self):
+        if self.count == 0:
+            raise ValueError("Height data cannot be empty.")
+
+    def std(self, ddof: int = 0) -> float:
+        """Standard deviation of the heights, ddof=0 like np.std."""
+        self._check_not_empty()
+        return float(np.sqrt(self.m2 / (self.count - ddof)))
+
+    def percentiles(self) -> tuple:
+        """Estimated 25th, 50th and 75th percentiles of the heights."""
+        self._check_not_empty()
+        return tuple(float(value) for value in self.sketch.quantile([0.25, 0.5, 0.75]))
+
+    def outlier_bounds(self) -> tuple:
+        """Lower and upper IQR bounds, heights outside them are outliers."""
+        p25, _, p75 = self.percentiles()
+        iqr = p75 - p25
+        return p25 - 1.5 * iqr, p75 + 1.5 * iqr
+
+    def summary(self) -> dict:
+        """The statistics of summarize, without the outlier mask which needs the data.
+
+        Returns:
+            dict: "count", "mean", "median", "std", "p25", "p50", "p75", "iqr", "lower_bound" and "upper_bound".
+        Raises:
+            ValueError: Height data cannot be empty.
+        """
+        p25, p50, p75 = self.percentiles()
+        lower_bound, upper_bound = self.outlier_bounds()
+        return {
+            "count": self.count,
+            "mean": self.mean,
+            "median": p50,
+            "std": self.std(),
+            "p25": p25,
+            "p50": p50,
+            "p75": p75,
+            "iqr": p75 - p25,
+            "lower_bound": lower_bound,
+            "upper_bound": upper_bound,
+        }
+
+
+def read_height_chunks(path: str, chunk_size: int = READ_CHUNK_SIZE, column=0):
+    """Reads heights from a .npy or CSV file in chunks.
+
+    Args:
+        path (str): Path to a .npy file (memory-mapped) or a CSV file.
+        chunk_size (int, optional): Number of heights per chunk.
+        column (int or str, optional): Column of the CSV file, a name means the first line is a header.
+
+    Returns:
+        generator: np.ndarray chunks of heights.
+    Raises:
+        ValueError: If the column name is not in the header.
+    """
+    if path.endswith('.npy'):
+        data = np.load(path, mmap_mode='r')
+        for start in range(0, len(data), chunk_size):
+            yield np.asarray(data[start:start + chunk_size])
+        return
+    with open(path, 'r') as f:
+        if isinstance(column, str):
+            header = [name.strip() for name in f.readline().rstrip('\n').split(',')]
+            if column not in header:
+                raise ValueError(f"Column {column} is not in {path}.")
+            column = header.index(column)
+        while lines := list(islice(f, chunk_size)):
+            yield np.loadtxt(lines, delimiter=',', usecols=column, ndmin=1)
+
+
+def _accumulate_file(job: tuple) -> HeightAccumulator:
+    path, chunk_size, column, sketch_size, seed = job
+    accumulator = HeightAccumulator(sketch_size, seed)
+    for chunk in read_height_chunks(path, chunk_size, column):
+        accumulator.update(chunk)
+    return accumulator
+
+
+def accumulate_files(paths: list, column=0, chunk_size: int = READ_CHUNK_SIZE, workers: int = None,
+                     sketch_size: int = DEFAULT_SKETCH_SIZE, seed: int = None) -> HeightAccumulator:
+    """Streams several .npy or CSV files through accumulators in a process pool and merges them.
+
+    Args:
+        paths (list): Paths of the files, see read_height_chunks.
+        column (int or str, optional): Column of the CSV files.
+        chunk_size (int, optional): Number of heights per chunk.
+        workers (int, optional): Number of worker processes, defaults to the number of CPUs.
+        sketch_size (int, optional): Size parameter of the quantile sketches.
+        seed (int, optional): Seed of the sketches, the result is reproducible for a given seed.
+
+    Returns:
+        HeightAccumulator: Statistics of all the files.
+    """
+    seeds = np.random.SeedSequence(seed).spawn(len(paths))
+    result = HeightAccumulator(sketch_size, seed)
+    with ProcessPoolExecutor(max_workers=workers) as executor:
+        jobs = [(path, chunk_size, column, sketch_size, file_seed) for path, file_seed in zip(paths, seeds)]
+        for accumulator in executor.map(_accumulate_file, jobs):
+            result.merge(accumulator)
+    return result
+
 # Example Usage
 if __name__ == "__main__":
     # Generate height data
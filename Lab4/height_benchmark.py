@@ -0,0 +1,56 @@
+"""Benchmark of the height analysis statistics.
+
+Compares the separate numpy calls used before summarize (np.mean, np.median, np.std, three
+np.percentile calls and the outlier mask) with the single summarize call.
+Run: python height_benchmark.py --size 100000000
+"""
+import argparse
+import time
+
+import numpy as np
+
+from height_analysis import summarize
+
+
+def separate_statistics(height_data: np.ndarray) -> dict:
+    """The summary calculated with the separate numpy calls, one pass (or partition) each."""
+    p25 = np.percentile(height_data, 25)
+    p75 = np.percentile(height_data, 75)
+    iqr = p75 - p25
+    lower_bound, upper_bound = p25 - 1.5 * iqr, p75 + 1.5 * iqr
+    return {
+        "mean": np.mean(height_data),
+        "median": np.median(height_data),
+        "std": np.std(height_data),
+        "p25": p25,
+        "p50": np.percentile(height_data, 50),
+        "p75": p75,
+        "outliers": (height_data < lower_bound) | (height_data > upper_bound),
+    }
+
+
+def _best_time(func, height_data: np.ndarray, repeat: int) -> float:
+    best = float('inf')
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(height_data)
+        best = min(best, time.perf_counter() - start)
+    return best
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark summarize against the separate numpy calls.")
+    parser.add_argument("--size", type=int, default=10 ** 8, help="Number of heights.")
+    parser.add_argument("--repeat", type=int, default=3, help="Number of timed calls, the best one is reported.")
+    parser.add_argument("--seed", type=int, default=0, help="Seed of the generated heights.")
+    args = parser.parse_args()
+
+    height_data = np.random.default_rng(args.seed).normal(170, 10, args.size)
+    separate = _best_time(separate_statistics, height_data, args.repeat)
+    fused = _best_time(summarize, height_data, args.repeat)
+    print(f"separate numpy calls: {separate:8.3f} s")
+    print(f"summarize:            {fused:8.3f} s  ({separate / fused:.2f}x)")
+
+
+if __name__ == "__main__":
+    main()